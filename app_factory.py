@@ -3,6 +3,7 @@
 Централизованная инициализация всех компонентов
 """
 import os
+import logging
 from flask import Flask
 from flask_migrate import Migrate
 from flask_login import LoginManager
@@ -10,6 +11,8 @@ from flask_caching import Cache
 
 from config import config
 from extensions import db, migrate, login_manager
+from utils.json_provider import init_json_provider
+from test_pdf import start_office_server
 # Импортируем модели для регистрации
 from models.base import BaseModel
 from models.user import User, Role
@@ -32,6 +35,10 @@ def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # В продакшне пишем в лог только предупреждения и ошибки
+    if not app.debug and not app.testing:
+        app.logger.setLevel(logging.WARNING)
+    
     # Инициализация расширений
     initialize_extensions(app)
     
@@ -50,12 +57,18 @@ def create_app(config_name=None):
     # Настройка кэширования
     setup_caching(app)
     
+    # Постоянный LibreOffice для конвертации DOCX -> PDF
+    setup_office_server(app)
+    
     return app
 
 
 def initialize_extensions(app):
     """Инициализация расширений Flask"""
     
+    # JSON (orjson, если установлен)
+    init_json_provider(app)
+    
     # SQLAlchemy
     db.init_app(app)
     
@@ -70,7 +83,7 @@ def initialize_extensions(app):
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.get_by_id(int(user_id))
+        return User.get_with_role(int(user_id))
 
 
 def register_blueprints(app):
@@ -114,7 +127,7 @@ def register_error_handlers(app):
     
     @app.errorhandler(500)
     def internal_error(error):
-        app.logger.error(f'Server Error: {error}')
+        app.logger.error('Server Error: %s', error)
         return {'error': 'Внутренняя ошибка сервера'}, 500
     
     @app.errorhandler(ValidationError)
@@ -158,7 +171,7 @@ def initialize_database(app):
             app.logger.info("Database initialized successfully")
             
         except Exception as e:
-            app.logger.error(f"Error initializing database: {e}")
+            app.logger.error("Error initializing database: %s", e)
             raise
 
 
@@ -307,7 +320,7 @@ def setup_ddos_protection(app):
     except ImportError:
         app.logger.warning("DDoS protection module not available")
     except Exception as e:
-        app.logger.error(f"Error setting up DDoS protection: {e}")
+        app.logger.error("Error setting up DDoS protection: %s", e)
 
 
 def setup_caching(app):
@@ -318,7 +331,23 @@ def setup_caching(app):
         app.cache = cache
         app.logger.info("Caching configured")
     except Exception as e:
-        app.logger.error(f"Error setting up caching: {e}")
+        app.logger.error("Error setting up caching: %s", e)
+
+
+def setup_office_server(app):
+    """Запуск постоянного LibreOffice (unoserver), если включён OFFICE_SERVER"""
+    
+    enabled = app.config.get('OFFICE_SERVER', os.getenv('OFFICE_SERVER', ''))
+    if str(enabled).lower() not in ('1', 'true', 'yes'):
+        return
+    
+    try:
+        if start_office_server() is None:
+            app.logger.warning("OFFICE_SERVER is enabled, but unoserver is not installed")
+        else:
+            app.logger.info("Office server started")
+    except Exception as e:
+        app.logger.error("Error starting office server: %s", e)
 
 
 def create_services(app):
@@ -166,6 +166,9 @@ VALUES ('Руководитель Р. Р.', 'pbkdf2:sha256:150000$xxxxxxxx$yyyyy
 -- Add indexes for performance
 CREATE INDEX idx_users_role_id ON users(role_id);
 CREATE INDEX idx_students_group_id ON students(group_id);
+CREATE INDEX ix_students_surname_lower ON students(lower(surname));
+CREATE INDEX ix_students_name_lower ON students(lower(name));
+CREATE INDEX ix_students_patronymic_lower ON students(lower(patronymic));
 CREATE INDEX idx_groups_direction_id ON groups(direction_id);
 CREATE INDEX idx_directions_cafedral_id ON directions(cafedral_id);
 CREATE INDEX idx_contracts_organization_id ON contracts(organization_id);
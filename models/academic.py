@@ -1,6 +1,7 @@
 """
 Модели академической структуры
 """
+from sqlalchemy.ext.hybrid import hybrid_property
 from .base import BaseModel
 from extensions import db
 
@@ -104,6 +105,32 @@ class Student(BaseModel):
     group = db.relationship("Group", back_populates="students")
     ask_forms = db.relationship("AskForm", back_populates="student")
     
+    # ФИО в нижнем регистре: в SQL это lower(столбец), который покрыт функциональными
+    # индексами ниже, поэтому хранить копию в отдельных столбцах не нужно
+    @hybrid_property
+    def surname_lc(self):
+        return self.surname.lower() if self.surname else None
+    
+    @surname_lc.expression
+    def surname_lc(cls):
+        return db.func.lower(cls.surname)
+    
+    @hybrid_property
+    def name_lc(self):
+        return self.name.lower() if self.name else None
+    
+    @name_lc.expression
+    def name_lc(cls):
+        return db.func.lower(cls.name)
+    
+    @hybrid_property
+    def patronymic_lc(self):
+        return self.patronymic.lower() if self.patronymic else None
+    
+    @patronymic_lc.expression
+    def patronymic_lc(cls):
+        return db.func.lower(cls.patronymic)
+    
     @property
     def full_name(self):
         """Получить полное имя студента"""
@@ -189,3 +216,15 @@ class PracticTime(BaseModel):
     
     def __repr__(self):
         return f'<PracticTime {self.name}>'
+
+
+# Функциональные индексы для регистронезависимого поиска студента по ФИО
+# (Student.*_lc в запросах разворачиваются именно в эти выражения lower(...))
+db.Index('ix_students_surname_lower', db.func.lower(Student.surname))
+db.Index('ix_students_name_lower', db.func.lower(Student.name))
+db.Index('ix_students_patronymic_lower', db.func.lower(Student.patronymic))
+# find_student_for_user сравнивает lower(student_id) с логином — нужен функциональный индекс
+db.Index('ix_students_student_id_lower', db.func.lower(Student.student_id))
+# Списки студентов группы и поиск консультанта группы / групп консультанта
+db.Index('idx_students_group_id', Student.group_id)
+db.Index('ix_consultant_groups_consultant_id', ConsultantGroup.consultant_id)
@@ -2,9 +2,31 @@
 Базовая модель с общими полями и методами
 """
 from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from extensions import db
 
 
+class utcnow(FunctionElement):
+    """
+    Текущее время сервера БД в UTC (как datetime.utcnow у столбцов моделей).
+    Одно время для всех узлов кластера, независимо от часов каждого процесса.
+    """
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    # В SQLite CURRENT_TIMESTAMP уже возвращает UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, 'postgresql')
+def _compile_utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
 class BaseModel(db.Model):
     """Базовая модель с общими полями"""
     __abstract__ = True
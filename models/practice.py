@@ -1,6 +1,8 @@
 """
 Модели практики и заявок
 """
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .base import BaseModel
 from extensions import db
 
@@ -58,11 +60,63 @@ class Status(BaseModel):
             {'name': '3', 'description': 'Отклонено', 'color': '#dc3545', 'is_final': True}
         ]
         
-        for status_data in default_statuses:
-            existing_status = cls.get_by_name(status_data['name'])
-            if not existing_status:
-                status = cls(**status_data)
+        insert = cls._upsert_insert()
+        if insert is not None:
+            # Один INSERT ... ON CONFLICT DO NOTHING: существующие статусы пропускаются
+            stmt = insert(cls).values(default_statuses).on_conflict_do_nothing(index_elements=['name'])
+            db.session.execute(stmt)
+            db.session.commit()
+            return
+        
+        # Одним запросом выясняем, какие статусы уже есть, и досоздаём недостающие
+        existing_names = {name for (name,) in db.session.query(cls.name)}
+        missing = [cls(**status_data) for status_data in default_statuses
+                   if status_data['name'] not in existing_names]
+        if missing:
+            db.session.add_all(missing)
+            db.session.commit()
+    
+    @classmethod
+    def ensure(cls, name):
+        """
+        Получить id статуса, создав его при отсутствии.
+        INSERT ... ON CONFLICT DO NOTHING RETURNING id не создаёт дублей при параллельных
+        запросах; если статус уже был, его id дочитывается отдельным SELECT.
+        """
+        insert = cls._upsert_insert()
+        if insert is not None:
+            stmt = (
+                insert(cls).values(name=name)
+                .on_conflict_do_nothing(index_elements=['name'])
+                .returning(cls.id)
+            )
+            status_id = db.session.execute(stmt).scalar()
+            db.session.commit()
+            if status_id is not None:
+                return status_id
+        else:
+            status = cls.get_by_name(name)
+            if status is None:
+                status = cls(name=name)
                 status.save()
+            return status.id
+        
+        return db.session.query(cls.id).filter_by(name=name).scalar()
+    
+    @staticmethod
+    def _upsert_insert():
+        """Конструктор INSERT с поддержкой ON CONFLICT для текущей СУБД (или None)"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            return pg_insert
+        if dialect == 'sqlite':
+            return sqlite_insert
+        return None
+    
+    @classmethod
+    def get_id_map(cls):
+        """Получить словарь {название статуса: id}"""
+        return dict(db.session.query(cls.name, cls.id))
     
     def __repr__(self):
         return f'<Status {self.name}>'
@@ -3,10 +3,27 @@
 """
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
 from .base import BaseModel
 from extensions import db
 
 
+# Битовые маски ролей: проверка роли сводится к одной побитовой операции
+ROLE_STUDENT = 1
+ROLE_TEACHER = 2
+ROLE_CONSULTANT = 4
+ROLE_ADMIN = 8
+
+ROLE_MASKS = {
+    'студент': ROLE_STUDENT,
+    'преподаватель': ROLE_TEACHER,
+    'преподаватель консультант': ROLE_CONSULTANT,
+    'администратор': ROLE_ADMIN,
+}
+
+
 class User(UserMixin, BaseModel):
     """Модель пользователя"""
     __tablename__ = 'users'
@@ -36,30 +53,54 @@ class User(UserMixin, BaseModel):
     
     @property
     def roles(self):
-        """Получить роли пользователя"""
-        if self.role:
-            return [self.role.name]
-        return []
+        """Получить роли пользователя (frozenset, кэшируется до смены role_id)"""
+        cached = getattr(self, '_roles_cache', None)
+        if cached is None or cached[0] != self.role_id:
+            cached = (self.role_id, frozenset((self.role.name,)) if self.role else frozenset())
+            self._roles_cache = cached
+        return cached[1]
+    
+    @property
+    def role_mask(self):
+        """Битовая маска роли (кэшируется до смены role_id)"""
+        cached = getattr(self, '_role_mask_cache', None)
+        if cached is None or cached[0] != self.role_id:
+            mask = ROLE_MASKS.get(self.role.name, 0) if self.role else 0
+            cached = (self.role_id, mask)
+            self._role_mask_cache = cached
+        return cached[1]
     
     @property
     def is_student(self):
         """Проверить, является ли пользователь студентом"""
-        return 'студент' in self.roles
+        return bool(self.role_mask & ROLE_STUDENT)
     
     @property
     def is_teacher(self):
         """Проверить, является ли пользователь преподавателем"""
-        return 'преподаватель' in self.roles
+        return bool(self.role_mask & ROLE_TEACHER)
     
     @property
     def is_consultant(self):
         """Проверить, является ли пользователь преподавателем-консультантом"""
-        return 'преподаватель консультант' in self.roles
+        return bool(self.role_mask & ROLE_CONSULTANT)
     
     def has_role(self, role_name):
         """Проверить, имеет ли пользователь определенную роль"""
+        mask = ROLE_MASKS.get(role_name)
+        if mask is not None:
+            return bool(self.role_mask & mask)
         return role_name in self.roles
     
+    def has_any_role(self, required_mask):
+        """Проверить, есть ли у пользователя хотя бы одна роль из маски"""
+        return bool(self.role_mask & required_mask)
+    
+    @classmethod
+    def get_with_role(cls, user_id):
+        """Получить пользователя вместе с ролью одним запросом (для user_loader)"""
+        return db.session.get(cls, user_id, options=[joinedload(cls.role)])
+    
     @classmethod
     def get_by_username(cls, username):
         """Получить пользователя по имени"""
@@ -95,6 +136,24 @@ class Role(BaseModel):
         """Получить роль по имени"""
         return cls.query.filter_by(name=name).first()
     
+    @classmethod
+    def ensure_roles(cls, names):
+        """Создать недостающие роли одним INSERT ... ON CONFLICT DO NOTHING"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            insert = pg_insert
+        elif dialect == 'sqlite':
+            insert = sqlite_insert
+        else:
+            existing = {name for (name,) in db.session.query(cls.name).filter(cls.name.in_(names))}
+            db.session.add_all([cls(name=name) for name in names if name not in existing])
+            db.session.commit()
+            return
+        
+        stmt = insert(cls).values([{'name': name} for name in names])
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=['name']))
+        db.session.commit()
+    
     @classmethod
     def create_default_roles(cls):
         """Создать роли по умолчанию"""
@@ -119,3 +178,7 @@ class Role(BaseModel):
     
     def __repr__(self):
         return f'<Role {self.name}>'
+
+
+# Выборки пользователей по роли (руководители, консультанты) фильтруют по role_id
+db.Index('idx_users_role_id', User.role_id)
@@ -199,21 +199,27 @@ with app.app_context():
     db.session.commit()
     
     # 10. Создание заявок на практику
-    for i in range(5):
-        # Выбор случайных данных
-        student = random.choice([s for s in Student.query.all()])
-        practice_type = random.choice(list(practice_types.values()))
-        contract = random.choice(list(contracts.values()))
-        status = random.choice(list(statuses.values()))
-        
-        # Руководители
-        teacher_role = Role.query.filter_by(name="преподаватель").first()
-        teachers = User.query.filter_by(role_id=teacher_role.id).all()
+    ask_form_count = 5
+    all_students = Student.query.all()
+    practice_type_list = list(practice_types.values())
+    contract_list = list(contracts.values())
+    status_list = list(statuses.values())
+    
+    # Руководители
+    teacher_role = Role.query.filter_by(name="преподаватель").first()
+    teachers = User.query.filter_by(role_id=teacher_role.id).all()
+    
+    if teachers and len(teachers) >= 2:
+        consultant = teachers[0]
+        practice_leader = teachers[1]
         
-        if teachers and len(teachers) >= 2:
-            consultant = teachers[0]
-            practice_leader = teachers[1]
-            
+        # Выбор случайных данных
+        for student, practice_type, contract, status in zip(
+            random.choices(all_students, k=ask_form_count),
+            random.choices(practice_type_list, k=ask_form_count),
+            random.choices(contract_list, k=ask_form_count),
+            random.choices(status_list, k=ask_form_count)
+        ):
             ask_form = AskForm(
                 practice_type=practice_type.id,
                 group=student.group_id,
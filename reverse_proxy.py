@@ -1,16 +1,28 @@
 import argparse
+import functools
+import heapq
 import json
 import logging
 import os
+import queue
+import re
 import socket
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse
 import http.client
 import requests
+from requests.adapters import HTTPAdapter
 import uuid
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +40,51 @@ DEFAULT_PORT = 8000
 DEFAULT_ALGORITHM = "round_robin"
 DEFAULT_HEALTH_CHECK_INTERVAL = 10  # seconds
 DEFAULT_HEALTH_CHECK_TIMEOUT = 5  # seconds
+DEFAULT_HEALTH_CHECK_MODE = "full"  # full: GET /health with node data, head: HEAD /health, tcp: connect only
 DEFAULT_STICKY_SESSIONS = False
+MAX_HEALTH_CHECK_WORKERS = 32
+
+HASH_MASK_64 = (1 << 64) - 1
+
+# Hop-by-hop headers are not forwarded to the backend
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate',
+    'proxy-authorization', 'te', 'trailers',
+    'transfer-encoding', 'upgrade'
+})
+# Backend response headers not copied to the client
+SKIPPED_RESPONSE_HEADERS = frozenset({'transfer-encoding', 'connection'})
+# Forwarding errors are logged by a background thread, off the request path
+ERROR_LOG_QUEUE = queue.Queue(maxsize=10000)
+
+# Sticky session cookie
+SERVERID_COOKIE_RE = re.compile(r'(?:^|;)\s*SERVERID=([^;]*)')
+
+# Shared keep-alive session for health checks (one pooled connection per node)
+HEALTH_SESSION = requests.Session()
+HEALTH_SESSION.mount('http://', HTTPAdapter(pool_connections=MAX_HEALTH_CHECK_WORKERS, pool_maxsize=MAX_HEALTH_CHECK_WORKERS))
+HEALTH_SESSION.mount('https://', HTTPAdapter(pool_connections=MAX_HEALTH_CHECK_WORKERS, pool_maxsize=MAX_HEALTH_CHECK_WORKERS))
+
+def ip_to_int(ip):
+    """Convert a client IP address to an integer for hashing"""
+    try:
+        return int.from_bytes(socket.inet_aton(ip), 'big')
+    except OSError:
+        pass
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+    except OSError:
+        return zlib.crc32(ip.encode())
+
+def jump_hash(key, num_buckets):
+    """Jump consistent hash: map an integer key to a bucket in [0, num_buckets)"""
+    key = (key ^ (key >> 64)) & HASH_MASK_64
+    bucket, jump = -1, 0
+    while jump < num_buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & HASH_MASK_64
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
 
 class ReverseProxyConfig:
     def __init__(self):
@@ -37,15 +93,65 @@ class ReverseProxyConfig:
         self.algorithm = DEFAULT_ALGORITHM
         self.health_check_interval = DEFAULT_HEALTH_CHECK_INTERVAL
         self.health_check_timeout = DEFAULT_HEALTH_CHECK_TIMEOUT
+        self.health_check_mode = DEFAULT_HEALTH_CHECK_MODE
         self.sticky_sessions = DEFAULT_STICKY_SESSIONS
         self.proxy_id = str(uuid.uuid4())[:8]
 
 class ClusterState:
-    def __init__(self):
+    def __init__(self, use_conn_heap=False):
         self.active_nodes = []
         self.node_stats = {}
+        self.node_locks = {}  # Per-node locks guarding node_stats counters
         self.node_index = 0  # For round-robin
         self.lock = threading.Lock()
+        self.use_conn_heap = use_conn_heap
+        self.active_node_set = frozenset()
+        self.node_url_parts = {}  # Parsed backend URLs, refreshed with active_nodes
+        self.backend_ids = {}  # SERVERID cookie values, refreshed with active_nodes
+        # For least_connections: heap of (connections, node); stale entries are skipped lazily
+        self.conn_heap = []
+    
+    def rebuild_conn_heap(self):
+        """Rebuild the least-connections heap from node stats (call with lock held)"""
+        self.conn_heap = [(self.node_stats[node]["connections"], node) for node in self.active_nodes]
+        heapq.heapify(self.conn_heap)
+    
+    def adjust_connections(self, node, delta):
+        """Change the active connection count of a node"""
+        stats = self.node_stats.get(node)
+        if stats is None:
+            return
+        if not self.use_conn_heap:
+            with self.node_locks[node]:
+                stats["connections"] += delta
+            return
+        
+        # The least-connections heap is shared, so it needs the cluster lock
+        with self.lock:
+            stats["connections"] += delta
+            if node in self.active_node_set:
+                heapq.heappush(self.conn_heap, (stats["connections"], node))
+                # Drop accumulated stale entries once the heap grows too large
+                if len(self.conn_heap) > 4 * len(self.active_node_set) + 16:
+                    self.rebuild_conn_heap()
+    
+    def increment_stat(self, node, key):
+        """Increment a node counter under that node's own lock"""
+        stats = self.node_stats.get(node)
+        if stats is None:
+            return
+        with self.node_locks[node]:
+            stats[key] = stats.get(key, 0) + 1
+    
+    def least_connected_node(self):
+        """Return the active node with the fewest connections (call with lock held)"""
+        heap = self.conn_heap
+        while heap:
+            connections, node = heap[0]
+            if node in self.active_node_set and self.node_stats[node]["connections"] == connections:
+                return node
+            heapq.heappop(heap)
+        return None
 
 class ReverseProxyHandler(BaseHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
@@ -53,6 +159,10 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
         self.cluster_state = args[2].cluster_state
         super().__init__(*args[:2], **kwargs)
     
+    def log_message(self, format, *args):
+        """Disable per-request access logging to stderr"""
+        pass
+    
     def do_GET(self):
         self.handle_request()
     
@@ -73,8 +183,9 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
     
     def handle_request(self):
         # Special proxy management endpoints
-        if self.path == '/proxy/status':
-            self.send_proxy_status()
+        path, _, query = self.path.partition('?')
+        if path == '/proxy/status':
+            self.send_proxy_status(pretty='pretty=1' in query.split('&'))
             return
         
         # Get client IP for sticky sessions and IP hash
@@ -83,12 +194,9 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
         # Check for sticky session cookie
         sticky_node = None
         if self.config.sticky_sessions:
-            cookies = self.headers.get('Cookie', '')
-            for cookie in cookies.split(';'):
-                cookie = cookie.strip()
-                if cookie.startswith('SERVERID='):
-                    sticky_node = cookie[9:]
-                    break
+            match = SERVERID_COOKIE_RE.search(self.headers.get('Cookie', ''))
+            if match:
+                sticky_node = match.group(1).strip()
         
         # Select a backend node
         backend = self.select_node(client_ip, sticky_node)
@@ -96,8 +204,8 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
             self.send_error(503, "Service Unavailable - No backend servers available")
             return
         
-        # Parse the backend URL
-        url = urlparse(backend)
+        # Parsed backend URL (cached per health-check sweep)
+        url = self.cluster_state.node_url_parts.get(backend) or urlparse(backend)
         host = url.netloc
         
         # Get request body for POST, PUT etc.
@@ -107,9 +215,7 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
         # Forward the request to the backend
         try:
             # Track connection in stats
-            with self.cluster_state.lock:
-                if backend in self.cluster_state.node_stats:
-                    self.cluster_state.node_stats[backend]["connections"] += 1
+            self.cluster_state.adjust_connections(backend, 1)
             
             # Create connection to backend
             if url.scheme == 'https':
@@ -118,15 +224,10 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
                 conn = http.client.HTTPConnection(host, timeout=30)
             
             # Prepare headers, removing hop-by-hop headers
-            headers = dict(self.headers)
-            hop_by_hop_headers = [
-                'connection', 'keep-alive', 'proxy-authenticate', 
-                'proxy-authorization', 'te', 'trailers', 
-                'transfer-encoding', 'upgrade'
-            ]
-            for header in hop_by_hop_headers:
-                if header in headers:
-                    del headers[header]
+            headers = {
+                header: value for header, value in self.headers.items()
+                if header.lower() not in HOP_BY_HOP_HEADERS
+            }
             
             # Add proxy headers
             headers['X-Forwarded-For'] = client_ip
@@ -150,12 +251,12 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
             
             # Add sticky session cookie if enabled
             if self.config.sticky_sessions and response.status < 400:
-                backend_id = backend.replace('http://', '').replace('https://', '').replace(':', '_')
+                backend_id = self.cluster_state.backend_ids.get(backend) or make_backend_id(backend)
                 self.send_header('Set-Cookie', f'SERVERID={backend_id}; Path=/; HttpOnly')
             
             # Copy response headers
             for header, value in response.getheaders():
-                if header.lower() not in ('transfer-encoding', 'connection'):
+                if header.lower() not in SKIPPED_RESPONSE_HEADERS:
                     self.send_header(header, value)
             
             # End headers
@@ -168,22 +269,17 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
             conn.close()
             
             # Update stats
-            with self.cluster_state.lock:
-                if backend in self.cluster_state.node_stats:
-                    self.cluster_state.node_stats[backend]["connections"] -= 1
-                    self.cluster_state.node_stats[backend]["requests"] += 1
+            self.cluster_state.adjust_connections(backend, -1)
+            self.cluster_state.increment_stat(backend, "requests")
             
         except Exception as e:
-            logger.error(f"Error forwarding request to {backend}: {e}")
+            report_forward_error(backend, e)
             # If we haven't sent a response yet, send an error
             if not self.wfile.closed:
                 self.send_error(502, f"Bad Gateway: {str(e)}")
             
             # Mark node as potentially unhealthy
-            with self.cluster_state.lock:
-                if backend in self.cluster_state.node_stats:
-                    self.cluster_state.node_stats[backend]["errors"] = \
-                        self.cluster_state.node_stats[backend].get("errors", 0) + 1
+            self.cluster_state.increment_stat(backend, "errors")
     
     def select_node(self, client_ip, sticky_node=None):
         """Select a backend node based on the configured algorithm"""
@@ -209,14 +305,22 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
             
             elif self.config.algorithm == "least_connections":
                 # Select node with fewest active connections
-                return min(
-                    self.cluster_state.active_nodes, 
-                    key=lambda node: self.cluster_state.node_stats[node]["connections"]
-                )
+                node = self.cluster_state.least_connected_node()
+                if node is None:
+                    self.cluster_state.rebuild_conn_heap()
+                    node = self.cluster_state.least_connected_node()
+                return node
             
             elif self.config.algorithm == "ip_hash":
-                # Consistent hashing based on client IP
-                hash_value = sum(ord(c) for c in client_ip)
+                # Consistent hashing based on client IP. Buckets are the configured
+                # backends, so a node going down only moves the clients it served.
+                hash_value = ip_to_int(client_ip)
+                backends = self.config.backend_nodes
+                for _ in range(len(backends)):
+                    node = backends[jump_hash(hash_value, len(backends))]
+                    if node in self.cluster_state.active_node_set:
+                        return node
+                    hash_value = (hash_value * 6364136223846793005 + 1442695040888963407) & HASH_MASK_64
                 return self.cluster_state.active_nodes[hash_value % len(self.cluster_state.active_nodes)]
             
             else:
@@ -225,8 +329,8 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
                 self.cluster_state.node_index += 1
                 return node
     
-    def send_proxy_status(self):
-        """Send proxy status information"""
+    def send_proxy_status(self, pretty=False):
+        """Send proxy status information (compact JSON unless pretty is requested)"""
         status = {
             "proxy_id": self.config.proxy_id,
             "active_nodes": self.cluster_state.active_nodes,
@@ -239,7 +343,13 @@ class ReverseProxyHandler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
         self.end_headers()
-        self.wfile.write(json.dumps(status, indent=2).encode())
+        if pretty:
+            body = json.dumps(status, indent=2).encode()
+        elif orjson is not None:
+            body = orjson.dumps(status)
+        else:
+            body = json.dumps(status, separators=(',', ':')).encode()
+        self.wfile.write(body)
 
 class ReverseProxyServer(HTTPServer):
     def __init__(self, server_address, RequestHandlerClass, config, cluster_state):
@@ -248,10 +358,22 @@ class ReverseProxyServer(HTTPServer):
         self.start_time = time.time()
         super().__init__(server_address, RequestHandlerClass)
 
-def health_check(node, timeout):
+@functools.lru_cache(maxsize=None)
+def node_address(node):
+    """Get the (host, port) pair of a backend URL"""
+    url = urlparse(node)
+    return url.hostname, url.port or (443 if url.scheme == 'https' else 80)
+
+def health_check(node, timeout, mode=DEFAULT_HEALTH_CHECK_MODE):
     """Check if a node is healthy"""
     try:
-        response = requests.get(f"{node}/health", timeout=timeout)
+        if mode == "tcp":
+            with socket.create_connection(node_address(node), timeout=timeout):
+                return True, None
+        if mode == "head":
+            response = HEALTH_SESSION.head(f"{node}/health", timeout=timeout)
+            return response.status_code == 200, None
+        response = HEALTH_SESSION.get(f"{node}/health", timeout=timeout)
         return response.status_code == 200, response.json() if response.status_code == 200 else None
     except Exception as e:
         logger.warning(f"Health check failed for {node}: {e}")
@@ -261,34 +383,62 @@ def update_cluster_state(config, cluster_state):
     """Update the list of active nodes in the cluster"""
     healthy_nodes = []
     
-    for node in config.backend_nodes:
-        is_healthy, node_data = health_check(node, config.health_check_timeout)
-        
-        if is_healthy:
+    # Check all nodes concurrently so a sweep takes one timeout, not one per node
+    workers = max(1, min(MAX_HEALTH_CHECK_WORKERS, len(config.backend_nodes)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda node: health_check(node, config.health_check_timeout, config.health_check_mode),
+            config.backend_nodes
+        ))
+    
+    with cluster_state.lock:
+        for node, (is_healthy, node_data) in zip(config.backend_nodes, results):
+            if not is_healthy:
+                continue
             healthy_nodes.append(node)
             
             # Initialize or update node stats
-            with cluster_state.lock:
-                if node not in cluster_state.node_stats:
-                    cluster_state.node_stats[node] = {
-                        "connections": 0,
-                        "requests": 0,
-                        "errors": 0
-                    }
-                
-                # Update with data from node if available
-                if node_data:
-                    cluster_state.node_stats[node]["server_id"] = node_data.get("server_id", "unknown")
-                    cluster_state.node_stats[node]["threads"] = node_data.get("threads", 0)
-    
-    with cluster_state.lock:
+            if node not in cluster_state.node_stats:
+                cluster_state.node_locks[node] = threading.Lock()
+                cluster_state.node_stats[node] = {
+                    "connections": 0,
+                    "requests": 0,
+                    "errors": 0
+                }
+            
+            # Update with data from node if available
+            if node_data:
+                cluster_state.node_stats[node]["server_id"] = node_data.get("server_id", "unknown")
+                cluster_state.node_stats[node]["threads"] = node_data.get("threads", 0)
+        
         old_count = len(cluster_state.active_nodes)
         cluster_state.active_nodes = healthy_nodes
+        cluster_state.active_node_set = frozenset(healthy_nodes)
+        cluster_state.node_url_parts = {node: urlparse(node) for node in healthy_nodes}
+        cluster_state.backend_ids = {node: make_backend_id(node) for node in healthy_nodes}
+        cluster_state.rebuild_conn_heap()
         new_count = len(cluster_state.active_nodes)
     
     if old_count != new_count:
         logger.info(f"Cluster state updated: {new_count} active nodes (was {old_count})")
 
+def make_backend_id(node):
+    """Build the SERVERID cookie value for a backend URL"""
+    return node.replace('http://', '').replace('https://', '').replace(':', '_')
+
+def report_forward_error(backend, error):
+    """Queue a forwarding error for the error log thread"""
+    try:
+        ERROR_LOG_QUEUE.put_nowait((backend, str(error)))
+    except queue.Full:
+        pass
+
+def error_log_writer():
+    """Background thread that writes queued forwarding errors to the log"""
+    while True:
+        backend, error = ERROR_LOG_QUEUE.get()
+        logger.error(f"Error forwarding request to {backend}: {error}")
+
 def cluster_health_monitor(config, cluster_state):
     """Background thread to monitor cluster health"""
     while True:
@@ -302,7 +452,7 @@ def cluster_health_monitor(config, cluster_state):
 def run_proxy_server(config):
     """Run the reverse proxy server"""
     # Initialize cluster state
-    cluster_state = ClusterState()
+    cluster_state = ClusterState(use_conn_heap=config.algorithm == "least_connections")
     
     # Initial cluster state update
     update_cluster_state(config, cluster_state)
@@ -315,6 +465,9 @@ def run_proxy_server(config):
     )
     monitor_thread.start()
     
+    # Start error logging thread
+    threading.Thread(target=error_log_writer, daemon=True).start()
+    
     # Create and run the server
     server = ReverseProxyServer(
         ('0.0.0.0', config.port),
@@ -354,6 +507,10 @@ def parse_args():
     parser.add_argument('-t', '--health-timeout', type=int, default=DEFAULT_HEALTH_CHECK_TIMEOUT,
                         help=f'Health check timeout in seconds (default: {DEFAULT_HEALTH_CHECK_TIMEOUT})')
     
+    parser.add_argument('-m', '--health-mode', type=str, default=DEFAULT_HEALTH_CHECK_MODE,
+                        choices=['full', 'head', 'tcp'],
+                        help=f'Health check mode: full GET with node data, HEAD request or TCP connect (default: {DEFAULT_HEALTH_CHECK_MODE})')
+    
     parser.add_argument('-s', '--sticky-sessions', action='store_true',
                         help='Enable sticky sessions (default: disabled)')
     
@@ -370,6 +527,7 @@ def main():
     config.algorithm = args.algorithm
     config.health_check_interval = args.health_interval
     config.health_check_timeout = args.health_timeout
+    config.health_check_mode = args.health_mode
     config.sticky_sessions = args.sticky_sessions
     
     # Run the proxy server
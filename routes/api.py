@@ -1,11 +1,14 @@
 """
 API маршруты для приложения GPO My
 """
-from flask import Blueprint, request, jsonify, current_app
-from flask_login import login_required, current_user
-from utils.decorators import role_required, json_response, handle_errors
-from services import UserService, StudentService, PracticeService, OrganizationService
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_login import current_user
+from utils.decorators import api_endpoint
+from services import UserService, StudentService, PracticeService, OrganizationService, StatisticsService
+from services.organization_service import ContractService
+from services.base_service import combined_version
 from utils.exceptions import ValidationError, BusinessLogicError, NotFoundError
+from utils.validators import Validator
 
 api = Blueprint('api', __name__)
 
@@ -14,13 +17,22 @@ user_service = UserService()
 student_service = StudentService()
 practice_service = PracticeService()
 organization_service = OrganizationService()
+contract_service = ContractService()
+statistics_service = StatisticsService()
+
+
+def conditional_json(etag, build):
+    """JSON-ответ с ETag; при совпадении If-None-Match — пустой 304 без сериализации"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    return response
 
 
 @api.route('/users', methods=['GET'])
-@login_required
-@role_required('преподаватель', 'администратор')
-@json_response
-@handle_errors
+@api_endpoint('преподаватель', 'администратор')
 def get_users():
     """Получить список пользователей"""
     page = request.args.get('page', 1, type=int)
@@ -31,25 +43,23 @@ def get_users():
     if role_filter:
         filters['role'] = role_filter
     
-    users = user_service.get_paginated(page=page, per_page=per_page, **filters)
+    users = user_service.get_paginated_dicts(page=page, per_page=per_page, **filters)
     
     return {
-        'users': [user.to_dict() for user in users.items],
+        'users': users['items'],
         'pagination': {
             'page': page,
             'per_page': per_page,
-            'total': users.total,
-            'pages': users.pages,
-            'has_next': users.has_next,
-            'has_prev': users.has_prev
+            'total': users['total'],
+            'pages': users['pages'],
+            'has_next': users['has_next'],
+            'has_prev': users['has_prev']
         }
     }
 
 
 @api.route('/users/<int:user_id>', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_user(user_id):
     """Получить пользователя по ID"""
     user = user_service.get_by_id(user_id)
@@ -60,9 +70,7 @@ def get_user(user_id):
 
 
 @api.route('/users/<int:user_id>', methods=['PUT'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def update_user(user_id):
     """Обновить пользователя"""
     data = request.get_json()
@@ -81,9 +89,7 @@ def update_user(user_id):
 
 
 @api.route('/students', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_students():
     """Получить список студентов"""
     page = request.args.get('page', 1, type=int)
@@ -102,25 +108,23 @@ def get_students():
             'total': len(students)
         }
     
-    students = student_service.get_paginated(page=page, per_page=per_page, **filters)
+    students = student_service.get_paginated_dicts(page=page, per_page=per_page, **filters)
     
     return {
-        'students': [student.to_dict() for student in students.items],
+        'students': students['items'],
         'pagination': {
             'page': page,
             'per_page': per_page,
-            'total': students.total,
-            'pages': students.pages,
-            'has_next': students.has_next,
-            'has_prev': students.has_prev
+            'total': students['total'],
+            'pages': students['pages'],
+            'has_next': students['has_next'],
+            'has_prev': students['has_prev']
         }
     }
 
 
 @api.route('/students/<int:student_id>', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_student(student_id):
     """Получить студента по ID"""
     student = student_service.get_student_with_group_info(student_id)
@@ -131,10 +135,7 @@ def get_student(student_id):
 
 
 @api.route('/students', methods=['POST'])
-@login_required
-@role_required('преподаватель', 'администратор')
-@json_response
-@handle_errors
+@api_endpoint('преподаватель', 'администратор')
 def create_student():
     """Создать нового студента"""
     data = request.get_json()
@@ -142,7 +143,6 @@ def create_student():
         raise ValidationError("Данные не предоставлены")
     
     # Валидация данных
-    from utils.validators import Validator
     validation = Validator.validate_student_data(data)
     if not validation['valid']:
         raise ValidationError("Ошибка валидации данных", errors=validation['errors'])
@@ -155,9 +155,7 @@ def create_student():
 
 
 @api.route('/applications', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_applications():
     """Получить список заявок"""
     page = request.args.get('page', 1, type=int)
@@ -168,38 +166,27 @@ def get_applications():
     # Фильтрация в зависимости от роли
     if current_user.is_student:
         # Студенты видят только свои заявки
-        applications = practice_service.get_student_applications(current_user.id)
-        return {
-            'applications': [practice_service.get_application_with_details(app.id) for app in applications],
-            'total': len(applications)
-        }
+        applications = practice_service.list_applications_with_details(student_id=current_user.id)
     elif current_user.is_teacher or getattr(current_user, 'is_consultant', False):
         # Преподаватели видят заявки, связанные с ними
-        applications = practice_service.get_teacher_applications(current_user.id)
-        return {
-            'applications': [practice_service.get_application_with_details(app.id) for app in applications],
-            'total': len(applications)
-        }
+        applications = practice_service.list_applications_with_details(teacher_id=current_user.id)
     else:
         # Администраторы видят все заявки
-        filters = {}
         if status:
-            applications = practice_service.get_applications_by_status(status)
+            applications = practice_service.list_applications_with_details(status_name=status)
         elif group_id:
-            applications = practice_service.get_applications_by_group(group_id)
+            applications = practice_service.list_applications_with_details(group_id=group_id)
         else:
-            applications = practice_service.get_all()
-        
-        return {
-            'applications': [practice_service.get_application_with_details(app.id) for app in applications],
-            'total': len(applications)
-        }
+            applications = practice_service.list_applications_with_details()
+    
+    return {
+        'applications': applications,
+        'total': len(applications)
+    }
 
 
 @api.route('/applications/<int:application_id>', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_application(application_id):
     """Получить заявку по ID"""
     application = practice_service.get_application_with_details(application_id)
@@ -214,10 +201,7 @@ def get_application(application_id):
 
 
 @api.route('/applications', methods=['POST'])
-@login_required
-@role_required('студент')
-@json_response
-@handle_errors
+@api_endpoint('студент')
 def create_application():
     """Создать новую заявку"""
     data = request.get_json()
@@ -225,7 +209,6 @@ def create_application():
         raise ValidationError("Данные не предоставлены")
     
     # Валидация данных
-    from utils.validators import Validator
     validation = Validator.validate_application_data(data)
     if not validation['valid']:
         raise ValidationError("Ошибка валидации данных", errors=validation['errors'])
@@ -255,10 +238,7 @@ def create_application():
 
 
 @api.route('/applications/<int:application_id>/approve', methods=['POST'])
-@login_required
-@role_required('преподаватель', 'администратор')
-@json_response
-@handle_errors
+@api_endpoint('преподаватель', 'администратор')
 def approve_application(application_id):
     """Одобрить заявку"""
     success = practice_service.approve_application(application_id, current_user.id)
@@ -269,10 +249,7 @@ def approve_application(application_id):
 
 
 @api.route('/applications/<int:application_id>/reject', methods=['POST'])
-@login_required
-@role_required('преподаватель', 'администратор')
-@json_response
-@handle_errors
+@api_endpoint('преподаватель', 'администратор')
 def reject_application(application_id):
     """Отклонить заявку"""
     data = request.get_json() or {}
@@ -286,23 +263,24 @@ def reject_application(application_id):
 
 
 @api.route('/organizations', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_organizations():
     """Получить список организаций"""
-    organizations = organization_service.get_active_organizations()
+    etag = organization_service.get_version()
     
-    return {
-        'organizations': [org.to_dict() for org in organizations],
-        'total': len(organizations)
-    }
+    def build():
+        # Тело кэшируется под той же версией, что и ETag
+        organizations = organization_service.get_active_organizations_data(etag)
+        return {
+            'organizations': organizations,
+            'total': len(organizations)
+        }
+    
+    return conditional_json(etag, build)
 
 
 @api.route('/organizations/<int:org_id>', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_organization(org_id):
     """Получить организацию по ID"""
     organization = organization_service.get_organization_with_contracts(org_id)
@@ -313,41 +291,37 @@ def get_organization(org_id):
 
 
 @api.route('/contracts', methods=['GET'])
-@login_required
-@json_response
-@handle_errors
+@api_endpoint()
 def get_contracts():
     """Получить список договоров"""
-    # Используем OrganizationService для получения договоров
-    from services.organization_service import ContractService
-    contract_service = ContractService()
-    contracts = contract_service.get_available_contracts()
+    # Доступность договоров зависит и от заявок (занятые слоты), и от
+    # текущего времени (договор вступает в силу или истекает)
+    etag = '{}-{}'.format(
+        combined_version(contract_service, practice_service),
+        contract_service.get_boundary_version()
+    )
     
-    return {
-        'contracts': [contract.to_dict() for contract in contracts],
-        'total': len(contracts)
-    }
+    def build():
+        # Тело кэшируется под той же версией, что и ETag
+        contracts = contract_service.get_available_contracts_data(etag)
+        return {
+            'contracts': contracts,
+            'total': len(contracts)
+        }
+    
+    return conditional_json(etag, build)
 
 
 @api.route('/statistics', methods=['GET'])
-@login_required
-@role_required('преподаватель', 'администратор')
-@json_response
-@handle_errors
+@api_endpoint('преподаватель', 'администратор')
 def get_statistics():
     """Получить статистику"""
-    user_stats = user_service.get_user_stats()
-    student_stats = student_service.get_student_stats()
-    practice_stats = practice_service.get_statistics()
-    
-    # Получаем статистику договоров
-    from services.organization_service import ContractService
-    contract_service = ContractService()
-    org_stats = contract_service.get_statistics()
-    
-    return {
-        'users': user_stats,
-        'students': student_stats,
-        'applications': practice_stats,
-        'contracts': org_stats
-    }
+    # Версия всех пяти таблиц — одним запросом, а не по запросу на таблицу;
+    # счетчики текущих и истекающих договоров меняются и со временем
+    etag = '{}-{}'.format(
+        combined_version(
+            user_service, student_service, practice_service, contract_service, organization_service
+        ),
+        contract_service.get_boundary_version(expiring_days=30)
+    )
+    return conditional_json(etag, statistics_service.get_all_stats)
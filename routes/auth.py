@@ -6,6 +6,7 @@ from services import UserService, StudentService
 from utils.decorators import handle_errors
 from utils.exceptions import ValidationError, BusinessLogicError
 from extensions import db
+from sqlalchemy import select, func, case, or_
 import logging
 
 auth = Blueprint('auth', __name__)
@@ -25,29 +26,29 @@ def _resolve_student_username(raw_username: str):
         return None
     
     surname, name, *rest = fio_parts
-    query = Student.query.filter(
-        Student.surname.ilike(surname),
-        Student.name.ilike(name)
-    )
-    if rest:
-        patronymic = rest[0]
-        query = query.filter(Student.patronymic.ilike(patronymic))
     
-    student = query.first()
-    if not student or not student.group:
-        return None
+    # Логин строится как фамилия_имя[_группа]; вычисляем оба варианта прямо в SQL,
+    # чтобы найти студента и его пользователя одним запросом
+    group_suffix = func.lower(func.replace(func.replace(Group.name, '-', ''), ' ', ''))
+    short_username = Student.surname_lc + '_' + Student.name_lc
+    full_username = short_username + '_' + group_suffix
     
-    group_suffix = student.group.name.replace('-', '').replace(' ', '').lower()
-    suggestions = [
-        f"{student.surname.lower()}_{student.name.lower()}_{group_suffix}",
-        f"{student.surname.lower()}_{student.name.lower()}"
-    ]
+    stmt = (
+        select(User)
+        .select_from(Student)
+        .join(Group, Student.group_id == Group.id)
+        .join(User, or_(User.username == full_username, User.username == short_username))
+        .where(
+            Student.surname_lc == surname.lower(),
+            Student.name_lc == name.lower()
+        )
+    )
+    if rest:
+        stmt = stmt.where(Student.patronymic_lc == rest[0].lower())
     
-    for candidate in suggestions:
-        user = User.query.filter_by(username=candidate).first()
-        if user:
-            return user
-    return None
+    # Логин с группой приоритетнее короткого
+    stmt = stmt.order_by(case((User.username == full_username, 0), else_=1)).limit(1)
+    return db.session.execute(stmt).scalars().first()
 
 
 @auth.route('/login', methods=['GET', 'POST'])
@@ -60,15 +61,11 @@ def login():
         if not user:
             user = _resolve_student_username(username_input)
         
-        if user:
-            print(f'[LOGIN] Найден user: {user.username} (is_active={user.is_active})')
-        
         if user and user.check_password(password) and user.is_active:
             login_user(user)
-            print('[LOGIN] Успех!')
             return redirect(url_for('main.index'))
         
-        print('[LOGIN] Неудача (либо не найден, либо не активен, либо пароль не тот)')
+        current_app.logger.debug("LOGIN FAILED: username=%s", username_input)
         flash('Неверное имя пользователя или пароль', 'danger')
     return render_template('login.html')
 
@@ -80,11 +77,10 @@ def register():
         role_name = request.form.get('role')
         group_name = request.form.get('group')
         
-        current_app.logger.info(f"REGISTER ATTEMPT: username='{username}', role='{role_name}', group='{group_name}'")
-        current_app.logger.info(f"REGISTER ATTEMPT: IP={request.remote_addr}, User-Agent={request.headers.get('User-Agent', 'Unknown')}")
+        current_app.logger.info("REGISTER ATTEMPT: username=%r, role=%r, group=%r", username, role_name, group_name)
         
         if not username or not password:
-            current_app.logger.warning(f"REGISTER FAILED: Empty credentials - username='{username}', password provided={bool(password)}")
+            current_app.logger.warning("REGISTER FAILED: Empty credentials - username=%r, password provided=%s", username, bool(password))
             flash('Пожалуйста, введите имя пользователя и пароль.', 'warning')
             return redirect(url_for('auth.register'))
         
@@ -92,7 +88,7 @@ def register():
         user = User.query.filter_by(username=username).first()
         
         if user:
-            current_app.logger.warning(f"REGISTER FAILED: User '{username}' already exists (ID: {user.id})")
+            current_app.logger.warning("REGISTER FAILED: User %r already exists (ID: %s)", username, user.id)
             flash('Пользователь с таким именем уже существует', 'danger')
             return redirect(url_for('auth.register'))
         
@@ -100,11 +96,7 @@ def register():
         role = Role.query.filter_by(name=role_name).first()
         if not role:
             # Create roles if they don't exist
-            required_roles = ['студент', 'преподаватель', 'преподаватель консультант']
-            for required_role_name in required_roles:
-                if not Role.query.filter_by(name=required_role_name).first():
-                    db.session.add(Role(name=required_role_name))
-            db.session.commit()
+            Role.ensure_roles(['студент', 'преподаватель', 'преподаватель консультант'])
             role = Role.query.filter_by(name=role_name).first()
         
         # Create new user
@@ -159,15 +151,14 @@ def register():
         
         try:
             flash('Регистрация прошла успешно! Теперь вы можете войти.', 'success')
-            current_app.logger.info(f"REGISTER SUCCESS: User '{username}' registered successfully with role '{role_name}'")
+            current_app.logger.info("REGISTER SUCCESS: User %r registered successfully with role %r", username, role_name)
             return redirect(url_for('auth.login'))
             
         except Exception as e:
-            current_app.logger.error(f"REGISTER ERROR: Exception during registration for username='{username}': {str(e)}")
+            current_app.logger.error("REGISTER ERROR: Exception during registration for username=%r: %s", username, e)
             flash('Произошла ошибка при регистрации. Попробуйте снова.', 'danger')
             return redirect(url_for('auth.register'))
     
-    current_app.logger.info("REGISTER PAGE: Register page accessed")
     return render_template('register.html')
 
 @auth.route('/logout')
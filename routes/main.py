@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, send_file, abort
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app, send_file, abort, g
 from flask_login import login_required, current_user
 from models import (
     User,
     Role,
     Student,
     Group,
+    Direction,
     PracticeType,
     Contract,
     Organization,
@@ -13,7 +14,10 @@ from models import (
     ConsultantGroup,
     PracticeDiary,
 )
+from models.user import ROLE_STUDENT, ROLE_TEACHER, ROLE_CONSULTANT
+from models.base import utcnow
 from extensions import db
+from services.organization_service import invalidate_reference_cache
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from io import BytesIO
@@ -22,13 +26,30 @@ from reportlab.lib.pagesizes import letter
 from pypdf import PdfWriter, PdfReader
 import tempfile
 import shutil
-from test_pdf import replace_text, replace_underline, process_template, convert_to_pdf
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+from test_pdf import replace_text, replace_underline, process_template, convert_to_pdf, open_template
 from docx import Document
 import re
+import functools
+from collections import OrderedDict
 from datetime import datetime
-from flask import session
+from markupsafe import Markup, escape
 import logging
-from sqlalchemy import func
+import traceback
+from sqlalchemy import func, select, insert, update, delete, case, and_, or_
+from sqlalchemy.orm import joinedload, selectinload, load_only
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 main = Blueprint('main', __name__)
 
@@ -36,18 +57,245 @@ main = Blueprint('main', __name__)
 NAME_TOKEN_SANITIZER = re.compile(r'[^A-Za-zА-Яа-яЁё-]')
 
 
+class _NameTokenTable(dict):
+    """
+    Таблица для str.translate: точка и подчёркивание становятся пробелом, пробельные
+    символы и разрешённые NAME_TOKEN_SANITIZER буквы остаются, прочее удаляется.
+    Решение для каждого символа принимается один раз и запоминается.
+    """
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if char in '._':
+            value = ' '
+        elif char.isspace() or not NAME_TOKEN_SANITIZER.match(char):
+            value = codepoint
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+
+_NAME_TOKEN_TABLE = _NameTokenTable()
+
+# Справочники ролей и статусов статичны: id кэшируются на процесс,
+# чтобы не делать JOIN по Role.name и SELECT по Status.name на каждый запрос
+_ROLE_IDS = {}
+_STATUS_IDS = {}
+
+# Панель, на которую index отправляет пользователя, по приоритету ролей;
+# все остальные попадают на панель студента
+_ROLE_DASHBOARDS = (
+    (ROLE_TEACHER, 'main.teacher_dashboard'),
+    (ROLE_CONSULTANT, 'main.consultant_dashboard'),
+)
+
+# Сколько кандидатов выбирается при поиске записи студента по имени пользователя
+STUDENT_MATCH_CANDIDATES = 20
+
+# Закрепления групп за консультантом меняются редко (только при взятии группы)
+CONSULTANT_GROUPS_CACHE_TIMEOUT = 120
+# Размер пачки при потоковом чтении списка студентов для формы заявки
+STUDENT_OPTIONS_BATCH = 500
+
+
+def _role_id(name: str):
+    """Получить id роли по названию (кэшируется после первого успешного поиска)."""
+    role_id = _ROLE_IDS.get(name)
+    if role_id is None:
+        role_id = db.session.query(Role.id).filter_by(name=name).scalar()
+        if role_id is not None:
+            _ROLE_IDS[name] = role_id
+    return role_id
+
+
+def _status_id(name: str):
+    """
+    Получить id статуса по названию.
+    Статусы по умолчанию засеваются при старте приложения, а их id загружаются
+    в _STATUS_IDS одним запросом; нестандартный статус создаётся при первом обращении.
+    """
+    if not _STATUS_IDS:
+        _STATUS_IDS.update(Status.get_id_map())
+    status_id = _STATUS_IDS.get(name)
+    if status_id is None:
+        # Идемпотентная вставка без гонки «проверить — создать»
+        status_id = Status.ensure(name)
+        _STATUS_IDS[name] = status_id
+    return status_id
+
+
+def _ask_form_details_options():
+    """Опции жадной загрузки всех связей заявки, которые выводят шаблоны и документы."""
+    return (
+        joinedload(AskForm.practice_type),
+        joinedload(AskForm.group),
+        joinedload(AskForm.student),
+        joinedload(AskForm.contract).joinedload(Contract.organization),
+        joinedload(AskForm.consultant_user),
+        joinedload(AskForm.practice_leader_user),
+        joinedload(AskForm.status),
+        joinedload(AskForm.diary)
+    )
+
+
+def _get_ask_form_or_404(form_id):
+    """Загрузить заявку со всеми связями одним запросом или вернуть 404."""
+    return AskForm.query.options(*_ask_form_details_options()).filter(AskForm.id == form_id).first_or_404()
+
+
+def _today():
+    """Текущие дата и время, вычисляемые один раз на запрос (или фоновую задачу)."""
+    if 'today' not in g:
+        g.today = datetime.now()
+    return g.today
+
+
+def _today_str():
+    """Текущая дата в формате ДД.ММ.ГГГГ, форматируемая один раз на запрос."""
+    if 'today_str' not in g:
+        g.today_str = _today().strftime('%d.%m.%Y')
+    return g.today_str
+
+
+def _insert_custom_contract(org_name, org_address, contract_number, date_start, date_end):
+    """
+    Создать организацию и договор для неё, вернуть id договора.
+    Две вставки INSERT ... RETURNING вместо add + flush для каждой записи:
+    id приходят сразу, а коммит выполняется один раз вместе с заявкой.
+    """
+    org_id = db.session.execute(
+        insert(Organization).values(name=org_name, address=org_address).returning(Organization.id)
+    ).scalar_one()
+    return db.session.execute(
+        insert(Contract).values(
+            contract_number=contract_number,
+            organization_id=org_id,
+            date_start=date_start,
+            date_end=date_end
+        ).returning(Contract.id)
+    ).scalar_one()
+
+
+def _practice_form_options_version(teacher_role_id, consultant_role_id):
+    """
+    Версия справочников для статичных выпадающих списков формы заявки:
+    количество строк и последнее изменение каждой таблицы, одним запросом.
+    """
+    columns = []
+    for model in (PracticeType, Contract, Organization, User, Group):
+        table = model.__table__
+        columns.append(select(func.count(table.c.id)).scalar_subquery())
+        columns.append(select(func.max(table.c.updated_at)).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one()) + (teacher_role_id, consultant_role_id)
+
+
+def _render_options(items, label):
+    """Собрать HTML тегов <option> для выпадающего списка."""
+    return Markup(''.join(
+        f'<option value="{item.id}">{escape(label(item))}</option>' for item in items
+    ))
+
+
+@functools.lru_cache(maxsize=4)
+def _practice_form_options(version):
+    """
+    Готовый HTML опций для типов практики, договоров и руководителей практики,
+    а также списки групп и консультантов (в них выбор зависит от студента).
+    Эти списки одинаковы для всех студентов, поэтому строятся один раз на версию
+    справочников, а не запросами и циклом Jinja на каждый запрос.
+    """
+    teacher_role_id, consultant_role_id = version[-2:]
+    # Для опций нужны только id и подпись — выбираем эти столбцы, а не целые объекты
+    practice_types = db.session.execute(select(PracticeType.id, PracticeType.name)).all()
+    # INNER JOIN с организацией сохраняет прежний отбор: договоры без организации не выводятся
+    contracts = db.session.execute(
+        select(Contract.id, Contract.contract_number)
+        .join(Organization, Contract.organization_id == Organization.id)
+    ).all()
+    # Руководители и консультанты — одним запросом по обеим ролям с разбором в Python
+    role_ids = [role_id for role_id in (teacher_role_id, consultant_role_id) if role_id]
+    staff = db.session.execute(
+        select(User.id, User.username, User.role_id).where(User.role_id.in_(role_ids))
+    ).all() if role_ids else []
+    practice_leaders = [user for user in staff if user.role_id == teacher_role_id]
+    consultants = [{'id': user.id, 'username': user.username}
+                   for user in staff if user.role_id == consultant_role_id]
+    return {
+        'practice_types': _render_options(practice_types, lambda practice_type: practice_type.name),
+        'contracts': _render_options(contracts, lambda contract: contract.contract_number),
+        'practice_leaders': _render_options(practice_leaders, lambda teacher: teacher.username),
+        'consultants': consultants,
+        'groups': [{'id': group_id, 'name': name}
+                   for group_id, name in db.session.execute(select(Group.id, Group.name)).all()],
+    }
+
+
+def _consultant_groups_cache_key(consultant_id):
+    return f"consultant:{consultant_id}:groups"
+
+
+def _consultant_groups(consultant_id):
+    """
+    Группы, закреплённые за консультантом, и группы, доступные для закрепления.
+    Результат хранится в кэше приложения в виде словарей (не ORM-объектов)
+    и сбрасывается при взятии группы.
+    """
+    cache = getattr(current_app, 'cache', None)
+    key = _consultant_groups_cache_key(consultant_id)
+    data = cache.get(key) if cache is not None else None
+    if data is not None:
+        return data
+    
+    assigned = (
+        db.session.query(Group.id, Group.name)
+        .join(ConsultantGroup, ConsultantGroup.group_id == Group.id)
+        .filter(ConsultantGroup.consultant_id == consultant_id)
+        .order_by(Group.name)
+        .all()
+    )
+    
+    # Анти-джойн вместо NOT IN по списку id: размер запроса не зависит от числа закреплений
+    available = (
+        db.session.query(Group.id, Group.name, Direction.name)
+        .outerjoin(Direction, Group.direction_id == Direction.id)
+        .outerjoin(ConsultantGroup, and_(
+            ConsultantGroup.group_id == Group.id,
+            ConsultantGroup.consultant_id == consultant_id
+        ))
+        .filter(ConsultantGroup.id.is_(None))
+        .order_by(Group.name)
+        .all()
+    )
+    
+    data = {
+        'groups': [{'id': group_id, 'name': name} for group_id, name in assigned],
+        'available_groups': [
+            {
+                'id': group_id,
+                'name': name,
+                'direction': {'name': direction_name} if direction_name else None
+            }
+            for group_id, name, direction_name in available
+        ],
+    }
+    if cache is not None:
+        cache.set(key, data, timeout=CONSULTANT_GROUPS_CACHE_TIMEOUT)
+    return data
+
+
+def _invalidate_consultant_groups(consultant_id):
+    cache = getattr(current_app, 'cache', None)
+    if cache is not None:
+        cache.delete(_consultant_groups_cache_key(consultant_id))
+
+
 def parse_user_full_name(username: str):
     """Разбить имя пользователя на ФИО и отбросить технические суффиксы."""
     if not username:
         return ("", "", "")
     
-    cleaned = username.replace('.', ' ').replace('_', ' ')
-    parts = []
-    
-    for raw_part in cleaned.split():
-        normalized = NAME_TOKEN_SANITIZER.sub('', raw_part.strip())
-        if normalized:
-            parts.append(normalized.title())
+    # Один проход translate вместо replace и регулярного выражения на каждое слово
+    parts = [part.title() for part in username.translate(_NAME_TOKEN_TABLE).split()]
     
     if not parts:
         return ("", "", "")
@@ -81,21 +329,21 @@ def _pick_preferred_student(students):
 
 def _merge_duplicate_students(primary, duplicates):
     """Переназначить заявки и удалить дубль студента."""
-    if not duplicates:
+    duplicate_ids = [duplicate.id for duplicate in duplicates if duplicate.id != primary.id]
+    if not duplicate_ids:
         return
     
-    changed = False
-    for duplicate in duplicates:
-        if duplicate.id == primary.id:
-            continue
-        ask_forms = AskForm.query.filter_by(student_id=duplicate.id).all()
-        for ask_form in ask_forms:
-            ask_form.student_id = primary.id
-        db.session.delete(duplicate)
-        changed = True
-    
-    if changed:
-        db.session.commit()
+    # Заявки переносятся и дубли удаляются двумя запросами, без загрузки объектов
+    db.session.execute(
+        update(AskForm)
+        .where(AskForm.student_id.in_(duplicate_ids))
+        .values(student_id=primary.id)
+    )
+    db.session.execute(
+        delete(Student)
+        .where(Student.id.in_(duplicate_ids))
+    )
+    db.session.commit()
 
 
 def find_student_for_user(user):
@@ -106,54 +354,69 @@ def find_student_for_user(user):
     username = user.username.strip()
     username_lower = username.lower()
     
-    # Попытка сопоставить по номеру студенческого
-    if username_lower:
-        student = Student.query.filter(func.lower(Student.student_id) == username_lower).first()
-        if student:
-            return student
-    
     surname, name, patronymic = parse_user_full_name(username)
     surname_lower = surname.lower() if surname else None
     name_lower = name.lower() if name else None
     patronymic_lower = patronymic.lower() if patronymic else None
     
-    def pick_with_filters(*filters):
-        if not filters:
-            return None
-        students = Student.query.filter(*filters).all()
-        if not students:
-            return None
-        if len(students) == 1:
-            return students[0]
-        primary = _pick_preferred_student(students)
-        duplicates = [s for s in students if s.id != primary.id]
-        _merge_duplicate_students(primary, duplicates)
-        return primary
-    
+    # Все способы сопоставления по убыванию точности: номер студенческого,
+    # ФИО, фамилия и имя, только фамилия, только имя
+    conditions = []
+    if username_lower:
+        conditions.append((func.lower(Student.student_id) == username_lower, 100))
     if surname_lower and name_lower:
-        base_filters = [
-            func.lower(Student.surname) == surname_lower,
-            func.lower(Student.name) == name_lower
-        ]
+        full_name_match = and_(Student.surname_lc == surname_lower, Student.name_lc == name_lower)
         if patronymic_lower:
-            with_patronymic = pick_with_filters(*(base_filters + [func.lower(Student.patronymic) == patronymic_lower]))
-            if with_patronymic:
-                return with_patronymic
-        student = pick_with_filters(*base_filters)
-        if student:
-            return student
-    
+            conditions.append((and_(full_name_match, Student.patronymic_lc == patronymic_lower), 90))
+        conditions.append((full_name_match, 80))
     if surname_lower:
-        student = Student.query.filter(func.lower(Student.surname) == surname_lower).first()
-        if student:
-            return student
-    
+        conditions.append((Student.surname_lc == surname_lower, 50))
     if name_lower:
-        student = Student.query.filter(func.lower(Student.name) == name_lower).first()
-        if student:
-            return student
+        conditions.append((Student.name_lc == name_lower, 40))
+    if not conditions:
+        return None
     
-    return None
+    # Один запрос вместо каскада: кандидаты сразу упорядочены по оценке совпадения
+    score = case(*conditions, else_=0)
+    rows = (
+        db.session.query(Student, score)
+        .filter(or_(*(condition for condition, _ in conditions)))
+        .order_by(score.desc(), Student.id)
+        .limit(STUDENT_MATCH_CANDIDATES)
+        .all()
+    )
+    if not rows:
+        return None
+    
+    best_score = rows[0][1]
+    if best_score not in (90, 80):
+        return rows[0][0]
+    
+    # Совпадение по ФИО: несколько записей — это дубли одного студента
+    students = [student for student, student_score in rows if student_score == best_score]
+    if len(students) == 1:
+        return students[0]
+    primary = _pick_preferred_student(students)
+    duplicates = [s for s in students if s.id != primary.id]
+    _merge_duplicate_students(primary, duplicates)
+    return primary
+
+
+def find_student_for_user_cached(user):
+    """
+    find_student_for_user с запоминанием результата на время запроса.
+    Ненайденный студент не кэшируется: его профиль может быть создан в этом же запросе.
+    """
+    if user is None or getattr(user, 'id', None) is None:
+        return find_student_for_user(user)
+    if 'student_cache' not in g:
+        g.student_cache = {}
+    student = g.student_cache.get(user.id)
+    if student is None:
+        student = find_student_for_user(user)
+        if student is not None:
+            g.student_cache[user.id] = student
+    return student
 
 
 def safe_value(value, default=""):
@@ -178,13 +441,83 @@ def fill_multiline_after(paragraphs, start_index, text):
             break
 
 
+# Подстроки шаблона дневника, по которым находятся заполняемые параграфы.
+# Порядок важен: если в параграфе несколько подстрок, его занимает более ранняя
+DIARY_TEMPLATE_NEEDLES = (
+    'ТИП практике',
+    'С инструкцией ознакомлен',
+    'Подпись обучающегося',
+    'Фамилия, имя, отчество обучающегося',
+    '____________________________________________________',
+    'Факультет',
+    '3. Курс',
+    '5. Место практики',
+    '6. Срок практики',
+    'Рабочий график (план) проведения практики',
+    '1. Тема практики',
+    '2. Цель практики',
+    '3. Задачи практики',
+    '3. Содержание работ практики',
+    '4. Отметки о прохождении инструктажа',
+    'Заключение о работе обучающегося',
+    'поощрения и взыскания',
+    'Оценка за практику:',
+    'Заключение руководителя практики от Университета',
+    'Оценка за практику:\t',
+    'Руководитель практики от Университета',
+    '«____» _____________  20__г.',
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _needle_automaton(needles):
+    """Автомат Ахо — Корасик для набора подстрок (None, если пакет ahocorasick не установлен)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, needle in enumerate(needles):
+        automaton.add_word(needle, index)
+    automaton.make_automaton()
+    return automaton
+
+
+def replace_paragraphs_containing(paragraphs, needles, texts):
+    """
+    Заменить текст параграфов, содержащих заданные подстроки, за один проход.
+    needles — кортеж различных подстрок, texts — новый текст параграфа для каждой из них.
+    Каждая подстрока занимает первый ещё не занятый параграф, где она встречается; если
+    в параграфе есть несколько подстрок, выигрывает более ранняя в needles — как при
+    последовательных поисках по документу.
+    Возвращает словарь {подстрока: позиция заменённого параграфа в paragraphs}.
+    """
+    automaton = _needle_automaton(needles)
+    positions = {}
+    pending = set(range(len(needles)))
+    
+    for position, paragraph in enumerate(paragraphs):
+        if not pending:
+            break
+        text = paragraph.text
+        if automaton is not None:
+            candidates = [index for _, index in automaton.iter(text) if index in pending]
+        else:
+            candidates = [index for index in pending if needles[index] in text]
+        if candidates:
+            index = min(candidates)
+            paragraph.text = texts[needles[index]]
+            positions[needles[index]] = position
+            pending.discard(index)
+    
+    return positions
+
+
 def build_practice_diary_document(ask_form, diary):
     """Сформировать документ дневника практики на основе шаблона."""
     template_path = os.path.join(current_app.root_path, 'ShABLON_Dnevnik_praktiki_A4.docx')
     if not os.path.exists(template_path):
         raise FileNotFoundError("Шаблон дневника 'ShABLON_Dnevnik_praktiki_A4.docx' не найден.")
     
-    doc = Document(template_path)
+    doc = open_template(template_path)
     paragraphs = doc.paragraphs
     
     student = diary.student or ask_form.student
@@ -200,49 +533,9 @@ def build_practice_diary_document(ask_form, diary):
     practice_type_name = safe_value(ask_form.practice_type.name if ask_form.practice_type else '')
     practice_view = safe_value(diary.assignment_theme, practice_type_name)
     
-    def update_paragraph_contains(substr, new_text):
-        for paragraph in paragraphs:
-            if substr in paragraph.text:
-                paragraph.text = new_text
-                return paragraph
-        return None
-    
-    update_paragraph_contains('ТИП практике', f"по {practice_type_name} практике: практика {practice_view}")
-    
     student_signature_text = safe_value(diary.student_signature)
     if diary.student_signed_at:
         student_signature_text = f"{student_signature_text} ({diary.student_signed_at.strftime('%d.%m.%Y %H:%M')})" if student_signature_text else diary.student_signed_at.strftime('%d.%m.%Y %H:%M')
-    update_paragraph_contains('С инструкцией ознакомлен', f"С инструкцией ознакомлен: {student_signature_text}")
-    update_paragraph_contains('Подпись обучающегося', f"Подпись обучающегося: {student_signature_text}")
-    
-    update_paragraph_contains('Фамилия, имя, отчество обучающегося', f"1.\tФамилия, имя, отчество обучающегося: {student_full_name}")
-    update_paragraph_contains('____________________________________________________', f"Номер студенческого билета: {safe_value(student.student_id if student else None)}")
-    update_paragraph_contains('Факультет', f"2.\tФакультет: {faculty}")
-    update_paragraph_contains('3. Курс', f"3. Курс {course}    4. Группа {group_name}")
-    update_paragraph_contains('5. Место практики', f"5. Место практики: {practice_place}")
-    update_paragraph_contains('6. Срок практики', f"6. Срок практики: {practice_period}")
-    update_paragraph_contains('Рабочий график (план) проведения практики', f"Рабочий график (план) проведения практики: {safe_value(diary.work_plan)}")
-    
-    update_paragraph_contains('1. Тема практики', f"1. Тема практики: {safe_value(diary.assignment_theme)}")
-    update_paragraph_contains('2. Цель практики', f"2. Цель практики: {safe_value(diary.assignment_goal)}")
-    update_paragraph_contains('3. Задачи практики', f"3. Задачи практики: {safe_value(diary.assignment_tasks)}")
-    
-    content_paragraph = update_paragraph_contains('3. Содержание работ практики', '3. Содержание работ практики')
-    if content_paragraph:
-        content_index = paragraphs.index(content_paragraph) + 1
-        fill_multiline_after(paragraphs, content_index, safe_value(diary.daily_entries))
-    
-    instruction_paragraph = update_paragraph_contains('4. Отметки о прохождении инструктажа', '4. Отметки о прохождении инструктажа')
-    if instruction_paragraph:
-        instr_index = paragraphs.index(instruction_paragraph) + 1
-        fill_multiline_after(paragraphs, instr_index, safe_value(diary.instruction_notes))
-    
-    update_paragraph_contains('Заключение о работе обучающегося', f"а) Заключение о работе обучающегося в период практики: {safe_value(diary.evaluation_note)}")
-    update_paragraph_contains('поощрения и взыскания', f"б) поощрения и взыскания (по приказам): {safe_value(diary.evaluation_rewards)}")
-    update_paragraph_contains('Оценка за практику:', f"Оценка за практику: {safe_value(diary.evaluation_grade)}")
-    
-    update_paragraph_contains('Заключение руководителя практики от Университета', f"6. Заключение руководителя практики от Университета: {safe_value(diary.university_conclusion)}")
-    update_paragraph_contains('Оценка за практику:\t', f"Оценка за практику: {safe_value(diary.university_grade)}")
     
     consultant_signature_text = safe_value(diary.consultant_signature, safe_value(ask_form.consultant_user.username if ask_form.consultant_user else ''))
     if diary.consultant_signed_at and consultant_signature_text:
@@ -252,22 +545,66 @@ def build_practice_diary_document(ask_form, diary):
     if diary.practice_leader_signed_at and practice_leader_signature_text:
         practice_leader_signature_text = f"{practice_leader_signature_text} ({diary.practice_leader_signed_at.strftime('%d.%m.%Y %H:%M')})"
     
-    update_paragraph_contains('Руководитель практики от Университета', f"Руководитель практики от Университета: {practice_leader_signature_text}")
+    # Дата подписи руководителя
+    leader_date = diary.practice_leader_signed_at or diary.consultant_signed_at or diary.student_signed_at
+    leader_date_text = (leader_date or _today()).strftime('«%d» %m %Y г.')
+    
+    # Все замены выполняются одним проходом по параграфам шаблона
+    texts = {
+        'ТИП практике': f"по {practice_type_name} практике: практика {practice_view}",
+        'С инструкцией ознакомлен': f"С инструкцией ознакомлен: {student_signature_text}",
+        'Подпись обучающегося': f"Подпись обучающегося: {student_signature_text}",
+        'Фамилия, имя, отчество обучающегося': f"1.\tФамилия, имя, отчество обучающегося: {student_full_name}",
+        '____________________________________________________': f"Номер студенческого билета: {safe_value(student.student_id if student else None)}",
+        'Факультет': f"2.\tФакультет: {faculty}",
+        '3. Курс': f"3. Курс {course}    4. Группа {group_name}",
+        '5. Место практики': f"5. Место практики: {practice_place}",
+        '6. Срок практики': f"6. Срок практики: {practice_period}",
+        'Рабочий график (план) проведения практики': f"Рабочий график (план) проведения практики: {safe_value(diary.work_plan)}",
+        '1. Тема практики': f"1. Тема практики: {safe_value(diary.assignment_theme)}",
+        '2. Цель практики': f"2. Цель практики: {safe_value(diary.assignment_goal)}",
+        '3. Задачи практики': f"3. Задачи практики: {safe_value(diary.assignment_tasks)}",
+        '3. Содержание работ практики': '3. Содержание работ практики',
+        '4. Отметки о прохождении инструктажа': '4. Отметки о прохождении инструктажа',
+        'Заключение о работе обучающегося': f"а) Заключение о работе обучающегося в период практики: {safe_value(diary.evaluation_note)}",
+        'поощрения и взыскания': f"б) поощрения и взыскания (по приказам): {safe_value(diary.evaluation_rewards)}",
+        'Оценка за практику:': f"Оценка за практику: {safe_value(diary.evaluation_grade)}",
+        'Заключение руководителя практики от Университета': f"6. Заключение руководителя практики от Университета: {safe_value(diary.university_conclusion)}",
+        'Оценка за практику:\t': f"Оценка за практику: {safe_value(diary.university_grade)}",
+        'Руководитель практики от Университета': f"Руководитель практики от Университета: {practice_leader_signature_text}",
+        '«____» _____________  20__г.': leader_date_text,
+    }
+    positions = replace_paragraphs_containing(paragraphs, DIARY_TEMPLATE_NEEDLES, texts)
+    content_position = positions.get('3. Содержание работ практики')
+    instruction_position = positions.get('4. Отметки о прохождении инструктажа')
+    
+    if content_position is not None:
+        fill_multiline_after(paragraphs, content_position + 1, safe_value(diary.daily_entries))
+    
+    if instruction_position is not None:
+        fill_multiline_after(paragraphs, instruction_position + 1, safe_value(diary.instruction_notes))
     
     # Добавим блок с подписью консультанта, если он есть
     if consultant_signature_text:
         doc.add_paragraph(f"Руководитель практики от профильной организации: {consultant_signature_text}")
     
-    # Дата подписи руководителя
-    leader_date = diary.practice_leader_signed_at or diary.consultant_signed_at or diary.student_signed_at
-    if leader_date:
-        update_paragraph_contains('«____» _____________  20__г.', f"«{leader_date.strftime('%d')}» {leader_date.strftime('%m')} {leader_date.strftime('%Y')} г.")
-    else:
-        update_paragraph_contains('«____» _____________  20__г.', f"«{datetime.now().strftime('%d')}» {datetime.now().strftime('%m')} {datetime.now().strftime('%Y')} г.")
-    
     return doc
 
 
+def _diary_access(ask_form):
+    """
+    Права текущего пользователя на дневник заявки: (студент-владелец, консультант,
+    руководитель практики). Маска роли и id читаются один раз на проверку.
+    """
+    role_mask = current_user.role_mask
+    user_id = current_user.id
+    return (
+        bool(role_mask & ROLE_STUDENT) and ask_form.responsible_user_id == user_id,
+        bool(role_mask & ROLE_CONSULTANT) and ask_form.consultant_leader_id == user_id,
+        bool(role_mask & ROLE_TEACHER) and ask_form.practice_leader_id == user_id,
+    )
+
+
 def prepare_practice_diary_docx(ask_form):
     diary = ask_form.diary
     if not diary:
@@ -279,37 +616,65 @@ def prepare_practice_diary_docx(ask_form):
     doc.save(docx_path)
     return docx_path, temp_dir
 
+
+@main.before_request
+def start_request_profiler():
+    """В режиме отладки профилировать запрос с ?_profile=1 через pyinstrument"""
+    if Profiler is None or not current_app.debug or request.args.get('_profile') != '1':
+        return
+    g.profiler = Profiler()
+    g.profiler.start()
+
+
+@main.after_request
+def stop_request_profiler(response):
+    """Сохранить HTML-отчёт профилировщика в PROFILE_FOLDER (по умолчанию profiles/)"""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    
+    profiler.stop()
+    profile_dir = os.path.join(current_app.root_path, current_app.config.get('PROFILE_FOLDER', 'profiles'))
+    os.makedirs(profile_dir, exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('.', '_')
+    report_path = os.path.join(
+        profile_dir, f"{endpoint}_{request.method}_{datetime.now():%Y%m%d_%H%M%S_%f}.html"
+    )
+    with open(report_path, 'w', encoding='utf-8') as report:
+        report.write(profiler.output_html())
+    current_app.logger.info("PROFILE: %s %s -> %s", request.method, request.path, report_path)
+    return response
+
+
 @main.route('/')
 def index():
-    current_app.logger.info(f"INDEX ROUTE: Access attempt from IP={request.remote_addr}")
+    log = current_app.logger
+    log.info("INDEX ROUTE: Access attempt from IP=%s", request.remote_addr)
     
     if current_user.is_authenticated:
-        current_app.logger.info(f"INDEX ROUTE: Authenticated user '{current_user.username}' (ID: {current_user.id})")
-        current_app.logger.info(f"INDEX ROUTE: User roles: {current_user.roles}")
-        current_app.logger.info(f"INDEX ROUTE: Is teacher: {current_user.is_teacher}")
-        current_app.logger.info(f"INDEX ROUTE: Is student: {current_user.is_student}")
+        user = current_user._get_current_object()
+        role_mask = user.role_mask
+        log.info("INDEX ROUTE: Authenticated user '%s' (ID: %s)", user.username, user.id)
+        log.info("INDEX ROUTE: User roles: %s (mask %s)", user.roles, role_mask)
         
         # Redirect to respective dashboard based on user role
-        if current_user.is_teacher:
-            current_app.logger.info(f"INDEX ROUTE: Redirecting teacher '{current_user.username}' to teacher dashboard")
-            return redirect(url_for('main.teacher_dashboard'))
-        elif current_user.is_consultant:
-            current_app.logger.info(f"INDEX ROUTE: Redirecting consultant '{current_user.username}' to consultant dashboard")
-            return redirect(url_for('main.consultant_dashboard'))
-        else:
-            current_app.logger.info(f"INDEX ROUTE: Redirecting student '{current_user.username}' to student dashboard")
-            return redirect(url_for('main.student_dashboard'))
+        endpoint = next(
+            (endpoint for mask, endpoint in _ROLE_DASHBOARDS if role_mask & mask),
+            'main.student_dashboard'
+        )
+        log.info("INDEX ROUTE: Redirecting '%s' to %s", user.username, endpoint)
+        return redirect(url_for(endpoint))
     
-    current_app.logger.info("INDEX ROUTE: User not authenticated, showing login page")
+    log.info("INDEX ROUTE: User not authenticated, showing login page")
     return render_template('login.html')
 
 @main.route('/profile')
 @login_required
 def profile():
     student_info = None
-    if 'студент' in current_user.roles:
+    if current_user.is_student:
         # Get student record for current user
-        student = find_student_for_user(current_user)
+        student = find_student_for_user_cached(current_user)
         if student and student.group:
             student_info = {
                 'group': student.group.name,
@@ -323,92 +688,110 @@ def profile():
 @main.route('/student/dashboard')
 @login_required
 def student_dashboard():
-    current_app.logger.info(f"STUDENT DASHBOARD: Access attempt by user '{current_user.username}' (ID: {current_user.id})")
-    current_app.logger.info(f"STUDENT DASHBOARD: User roles: {current_user.roles}")
-    current_app.logger.info(f"STUDENT DASHBOARD: IP={request.remote_addr}")
+    log = current_app.logger
+    log.info("STUDENT DASHBOARD: Access attempt by user '%s' (ID: %s)", current_user.username, current_user.id)
+    log.info("STUDENT DASHBOARD: User roles: %s", current_user.roles)
+    log.info("STUDENT DASHBOARD: IP=%s", request.remote_addr)
     
     # Check if user is a student
-    if 'студент' not in current_user.roles:
-        current_app.logger.warning(f"STUDENT DASHBOARD ACCESS DENIED: User '{current_user.username}' is not a student. Roles: {current_user.roles}")
+    if not current_user.is_student:
+        log.warning("STUDENT DASHBOARD ACCESS DENIED: User '%s' is not a student. Roles: %s", current_user.username, current_user.roles)
         flash('У вас нет доступа к этой странице', 'danger')
         return redirect(url_for('main.index'))
     
-    current_app.logger.info(f"STUDENT DASHBOARD: Access granted to student '{current_user.username}'")
+    log.info("STUDENT DASHBOARD: Access granted to student '%s'", current_user.username)
     
     # Get all forms for the current student
     ask_forms = []
-    student = find_student_for_user(current_user)
+    student = find_student_for_user_cached(current_user)
     
     if student:
-        current_app.logger.info(f"STUDENT DASHBOARD: Found student record for '{current_user.username}' (ID: {student.id})")
-        ask_forms = AskForm.query.filter(AskForm.student_id == student.id).all()
-        current_app.logger.info(f"STUDENT DASHBOARD: Found {len(ask_forms)} forms for student")
+        log.info("STUDENT DASHBOARD: Found student record for '%s' (ID: %s)", current_user.username, student.id)
+        # Шаблон выводит тип практики, группу, статус и дневник каждой заявки —
+        # догружаем их пакетно, а не отдельным SELECT на строку
+        ask_forms = (
+            AskForm.query
+            .options(
+                selectinload(AskForm.practice_type),
+                selectinload(AskForm.group),
+                selectinload(AskForm.status),
+                selectinload(AskForm.diary)
+            )
+            .filter(AskForm.student_id == student.id)
+            .all()
+        )
+        log.info("STUDENT DASHBOARD: Found %s forms for student", len(ask_forms))
     else:
-        current_app.logger.warning(f"STUDENT DASHBOARD: No student record found for user '{current_user.username}'")
+        log.warning("STUDENT DASHBOARD: No student record found for user '%s'", current_user.username)
     
-    current_app.logger.info(f"STUDENT DASHBOARD: Rendering dashboard for '{current_user.username}' with {len(ask_forms)} forms")
+    log.info("STUDENT DASHBOARD: Rendering dashboard for '%s' with %s forms", current_user.username, len(ask_forms))
     return render_template('student_dashboard.html', ask_forms=ask_forms)
 
 
 @main.route('/student/diaries')
 @login_required
 def student_diaries():
-    current_app.logger.info(f"STUDENT DIARIES: Access attempt by user '{current_user.username}' (ID: {current_user.id})")
+    current_app.logger.info("STUDENT DIARIES: Access attempt by user '%s' (ID: %s)", current_user.username, current_user.id)
     
     if not current_user.is_student:
         flash('У вас нет доступа к этой странице', 'danger')
         return redirect(url_for('main.index'))
     
-    ask_forms = AskForm.query.filter_by(responsible_user_id=current_user.id).order_by(AskForm.created_at.desc()).all()
-    current_app.logger.info(f"STUDENT DIARIES: Found {len(ask_forms)} forms for diaries")
+    ask_forms = (
+        AskForm.query
+        .options(
+            selectinload(AskForm.practice_type),
+            selectinload(AskForm.group),
+            selectinload(AskForm.diary)
+        )
+        .filter_by(responsible_user_id=current_user.id)
+        .order_by(AskForm.created_at.desc())
+        .all()
+    )
+    current_app.logger.info("STUDENT DIARIES: Found %s forms for diaries", len(ask_forms))
     
     return render_template('student_diaries.html', ask_forms=ask_forms)
 
 @main.route('/teacher/dashboard')
 @login_required
 def teacher_dashboard():
-    current_app.logger.info(f"TEACHER DASHBOARD: Access attempt by user '{current_user.username}' (ID: {current_user.id})")
-    current_app.logger.info(f"TEACHER DASHBOARD: User roles: {current_user.roles}")
-    current_app.logger.info(f"TEACHER DASHBOARD: IP={request.remote_addr}")
+    current_app.logger.info("TEACHER DASHBOARD: Access attempt by user '%s' (ID: %s)", current_user.username, current_user.id)
+    current_app.logger.info("TEACHER DASHBOARD: User roles: %s", current_user.roles)
+    current_app.logger.info("TEACHER DASHBOARD: IP=%s", request.remote_addr)
     
     # Check if user is a teacher
     if not current_user.is_teacher:
-        current_app.logger.warning(f"TEACHER DASHBOARD ACCESS DENIED: User '{current_user.username}' is not a teacher. Roles: {current_user.roles}")
+        current_app.logger.warning("TEACHER DASHBOARD ACCESS DENIED: User '%s' is not a teacher. Roles: %s", current_user.username, current_user.roles)
         flash('У вас нет доступа к этой странице', 'danger')
         return redirect(url_for('main.index'))
     
-    current_app.logger.info(f"TEACHER DASHBOARD: Access granted to teacher '{current_user.username}'")
+    current_app.logger.info("TEACHER DASHBOARD: Access granted to teacher '%s'", current_user.username)
     
     # Get all groups for the dropdown
-    groups = Group.query.order_by(Group.name).all()
-    current_app.logger.info(f"TEACHER DASHBOARD: Found {len(groups)} groups")
+    groups = Group.query.options(joinedload(Group.direction)).order_by(Group.name).all()
+    current_app.logger.info("TEACHER DASHBOARD: Found %s groups", len(groups))
     
-    current_app.logger.info(f"TEACHER DASHBOARD: Rendering dashboard for teacher '{current_user.username}' with {len(groups)} groups")
+    current_app.logger.info("TEACHER DASHBOARD: Rendering dashboard for teacher '%s' with %s groups", current_user.username, len(groups))
     return render_template('teacher_dashboard.html', groups=groups)
 
 
 @main.route('/consultant/dashboard')
 @login_required
 def consultant_dashboard():
-    current_app.logger.info(f"CONSULTANT DASHBOARD: Access attempt by user '{current_user.username}' (ID: {current_user.id})")
-    current_app.logger.info(f"CONSULTANT DASHBOARD: User roles: {current_user.roles}")
-    current_app.logger.info(f"CONSULTANT DASHBOARD: IP={request.remote_addr}")
+    log = current_app.logger
+    log.info("CONSULTANT DASHBOARD: Access attempt by user '%s' (ID: %s)", current_user.username, current_user.id)
+    log.info("CONSULTANT DASHBOARD: User roles: %s", current_user.roles)
+    log.info("CONSULTANT DASHBOARD: IP=%s", request.remote_addr)
     
     if not current_user.is_consultant:
-        current_app.logger.warning(f"CONSULTANT DASHBOARD ACCESS DENIED: User '{current_user.username}' is not a consultant. Roles: {current_user.roles}")
+        log.warning("CONSULTANT DASHBOARD ACCESS DENIED: User '%s' is not a consultant. Roles: %s", current_user.username, current_user.roles)
         flash('У вас нет доступа к этой странице', 'danger')
         return redirect(url_for('main.index'))
     
-    assignments = (
-        ConsultantGroup.query
-        .filter_by(consultant_id=current_user.id)
-        .join(Group, ConsultantGroup.group_id == Group.id)
-        .order_by(Group.name)
-        .all()
-    )
-    groups = [assignment.group for assignment in assignments if assignment.group]
-    assigned_group_ids = [assignment.group_id for assignment in assignments]
-    current_app.logger.info(f"CONSULTANT DASHBOARD: Assigned groups count for '{current_user.username}': {len(groups)}")
+    consultant_groups = _consultant_groups(current_user.id)
+    groups = consultant_groups['groups']
+    assigned_group_ids = [group['id'] for group in groups]
+    log.info("CONSULTANT DASHBOARD: Assigned groups count for '%s': %s", current_user.username, len(groups))
     
     selected_group_id = request.args.get('group_id', type=int)
     if not selected_group_id or selected_group_id not in assigned_group_ids:
@@ -419,6 +802,12 @@ def consultant_dashboard():
     if selected_group_id:
         forms = (
             AskForm.query
+            .options(
+                selectinload(AskForm.student),
+                selectinload(AskForm.practice_type),
+                selectinload(AskForm.status),
+                selectinload(AskForm.diary)
+            )
             .filter(
                 AskForm.consultant_leader_id == current_user.id,
                 AskForm.group_id == selected_group_id
@@ -426,14 +815,11 @@ def consultant_dashboard():
             .order_by(AskForm.created_at.desc())
             .all()
         )
-        selected_group = Group.query.get(selected_group_id)
-        current_app.logger.info(f"CONSULTANT DASHBOARD: Selected group ID={selected_group_id}, forms found={len(forms)}")
+        selected_group = next(group for group in groups if group['id'] == selected_group_id)
+        log.info("CONSULTANT DASHBOARD: Selected group ID=%s, forms found=%s", selected_group_id, len(forms))
     
-    available_groups_query = Group.query
-    if assigned_group_ids:
-        available_groups_query = available_groups_query.filter(~Group.id.in_(assigned_group_ids))
-    available_groups = available_groups_query.order_by(Group.name).all()
-    current_app.logger.info(f"CONSULTANT DASHBOARD: Available groups to claim: {len(available_groups)}")
+    available_groups = consultant_groups['available_groups']
+    log.info("CONSULTANT DASHBOARD: Available groups to claim: %s", len(available_groups))
     
     return render_template(
         'consultant_dashboard.html',
@@ -465,6 +851,7 @@ def consultant_claim_group(group_id):
     assignment = ConsultantGroup(consultant_id=current_user.id, group_id=group_id)
     db.session.add(assignment)
     db.session.commit()
+    _invalidate_consultant_groups(current_user.id)
     
     flash(f'Группа {group.name} закреплена за вами.', 'success')
     return redirect(url_for('main.consultant_dashboard', group_id=group_id))
@@ -484,7 +871,8 @@ def consultant_sign(form_id, document):
         return redirect(url_for('main.consultant_dashboard'))
     
     signature_text = f"Подписано {current_user.username}"
-    now = datetime.utcnow()
+    # Время подписи ставит сервер БД — одинаково для всех узлов кластера
+    now = utcnow()
     
     if document == 'contract':
         ask_form.consultant_contract_signature = signature_text
@@ -518,7 +906,18 @@ def students_by_group(group_id):
             return redirect(url_for('main.consultant_dashboard'))
     
     # Get all students in the group
-    students = Student.query.filter_by(group_id=group_id).all()
+    # Список выводит только ФИО студентов и номера/статусы заявок — остальные столбцы не читаем
+    students = (
+        Student.query
+        .options(
+            load_only(Student.id, Student.surname, Student.name, Student.patronymic),
+            selectinload(Student.ask_forms)
+            .load_only(AskForm.id, AskForm.student_id, AskForm.status_id)
+            .selectinload(AskForm.status)
+        )
+        .filter_by(group_id=group_id)
+        .all()
+    )
     group = Group.query.get_or_404(group_id)
     
     return render_template('student_list.html', students=students, group=group)
@@ -526,30 +925,32 @@ def students_by_group(group_id):
 @main.route('/practice-form', methods=['GET', 'POST'])
 @login_required
 def practice_form():
-    current_app.logger.info(f"PRACTICE FORM: Access attempt by user '{current_user.username}' (ID: {current_user.id})")
-    current_app.logger.info(f"PRACTICE FORM: User roles: {current_user.roles}")
-    current_app.logger.info(f"PRACTICE FORM: IP={request.remote_addr}")
-    current_app.logger.info(f"PRACTICE FORM: Method={request.method}")
+    log = current_app.logger
+    form = request.form
+    log.info("PRACTICE FORM: Access attempt by user '%s' (ID: %s)", current_user.username, current_user.id)
+    log.info("PRACTICE FORM: User roles: %s", current_user.roles)
+    log.info("PRACTICE FORM: IP=%s", request.remote_addr)
+    log.info("PRACTICE FORM: Method=%s", request.method)
     
     # Check if user is a student
-    if 'студент' not in current_user.roles:
-        current_app.logger.warning(f"PRACTICE FORM ACCESS DENIED: User '{current_user.username}' is not a student. Roles: {current_user.roles}")
+    if not current_user.is_student:
+        log.warning("PRACTICE FORM ACCESS DENIED: User '%s' is not a student. Roles: %s", current_user.username, current_user.roles)
         flash('У вас нет доступа к этой странице', 'danger')
         return redirect(url_for('main.index'))
     
-    current_app.logger.info(f"PRACTICE FORM: Access granted to student '{current_user.username}'")
+    log.info("PRACTICE FORM: Access granted to student '%s'", current_user.username)
     
     if request.method == 'POST':
-        current_app.logger.info("PRACTICE FORM: Processing POST request")
+        log.info("PRACTICE FORM: Processing POST request")
         try:
             # Get form data
-            practice_type = request.form.get('practice_type')
-            group = request.form.get('group')
-            student = request.form.get('student')
-            consultant_leader = request.form.get('consultant_leader')
-            practice_leader = request.form.get('practice_leader')
-            phone_number = request.form.get('phone_number')
-            email = request.form.get('email')
+            practice_type = form.get('practice_type')
+            group = form.get('group')
+            student = form.get('student')
+            consultant_leader = form.get('consultant_leader')
+            practice_leader = form.get('practice_leader')
+            phone_number = form.get('phone_number')
+            email = form.get('email')
             try:
                 group_id_int = int(group) if group else None
             except (TypeError, ValueError):
@@ -568,77 +969,49 @@ def practice_form():
                 flash('Укажите руководителя практики.', 'danger')
                 return redirect(url_for('main.practice_form'))
             
-            current_app.logger.info(f"PRACTICE FORM: Form data received:")
-            current_app.logger.info(f"  - practice_type: {practice_type}")
-            current_app.logger.info(f"  - group: {group}")
-            current_app.logger.info(f"  - student: {student}")
-            current_app.logger.info(f"  - consultant_leader: {consultant_leader}")
-            current_app.logger.info(f"  - practice_leader: {practice_leader}")
-            current_app.logger.info(f"  - phone_number: {phone_number}")
-            current_app.logger.info(f"  - email: {email}")
+            if log.isEnabledFor(logging.INFO):
+                log.info("PRACTICE FORM: Form data received:")
+                log.info("  - practice_type: %s", practice_type)
+                log.info("  - group: %s", group)
+                log.info("  - student: %s", student)
+                log.info("  - consultant_leader: %s", consultant_leader)
+                log.info("  - practice_leader: %s", practice_leader)
+                log.info("  - phone_number: %s", phone_number)
+                log.info("  - email: %s", email)
             
             # Check if using custom organization
-            use_custom_org = 'use_custom_org' in request.form
-            current_app.logger.info(f"PRACTICE FORM: use_custom_org: {use_custom_org}")
+            use_custom_org = 'use_custom_org' in form
+            log.info("PRACTICE FORM: use_custom_org: %s", use_custom_org)
         except Exception as e:
-            current_app.logger.error(f"PRACTICE FORM ERROR: Exception during form data processing: {str(e)}")
-            current_app.logger.error(f"PRACTICE FORM ERROR: Exception type: {type(e).__name__}")
-            import traceback
-            current_app.logger.error(f"PRACTICE FORM ERROR: Traceback: {traceback.format_exc()}")
+            log.error("PRACTICE FORM ERROR: Exception during form data processing: %s", e)
+            log.error("PRACTICE FORM ERROR: Exception type: %s", type(e).__name__)
+            log.error("PRACTICE FORM ERROR: Traceback: %s", traceback.format_exc())
             flash('Произошла ошибка при обработке данных заявки. Попробуйте снова.', 'danger')
             return redirect(url_for('main.practice_form'))
         
-        # Store user data in session for PDF generation
-        session['phone_number'] = phone_number
-        session['email'] = email
-        
         # Handle contract selection or custom organization
         if use_custom_org:
             # Get custom organization data
-            custom_org_name = request.form.get('custom_org_name')
-            custom_org_address = request.form.get('custom_org_address')
-            custom_contract_num = request.form.get('custom_contract_num')
+            custom_org_name = form.get('custom_org_name')
+            custom_org_address = form.get('custom_org_address')
+            custom_contract_num = form.get('custom_contract_num')
             
-            # Create a new organization record
-            new_org = Organization(
-                name=custom_org_name,
-                address=custom_org_address
-            )
-            db.session.add(new_org)
-            db.session.flush()  # Get ID without committing
-            
-            # Create a new contract record
-            today = datetime.now()
-            new_contract = Contract(
+            # Create new organization and contract records (committed together with the form)
+            today = _today()
+            contract = _insert_custom_contract(
+                org_name=custom_org_name,
+                org_address=custom_org_address,
                 contract_number=custom_contract_num or f"Временный №{today.strftime('%Y%m%d%H%M%S')}",
-                organization_id=new_org.id,
                 date_start=today,
                 date_end=today.replace(year=today.year + 1)  # One year contract
             )
-            db.session.add(new_contract)
-            db.session.flush()  # Get ID without committing
-            
-            # Use the new contract
-            contract = new_contract.id
-            
-            # Save custom organization info in session for PDF generation
-            session['custom_organization'] = True
-            session['organization_name'] = custom_org_name
-            session['organization_address'] = custom_org_address
         else:
             # Using existing contract
-            contract = request.form.get('contract')
-            session['custom_organization'] = False
+            contract = form.get('contract')
         
         # Create new form with status 1 (на рассмотрении)
-        status = Status.query.filter_by(name='1').first()
-        if not status:
-            current_app.logger.info("PRACTICE FORM: Creating new status '1' (на рассмотрении)")
-            status = Status(name='1')
-            db.session.add(status)
-            db.session.commit()
-        else:
-            current_app.logger.info(f"PRACTICE FORM: Using existing status '1' (ID: {status.id})")
+        status_id = _status_id('1')
+        log.info("PRACTICE FORM: Using status '1' (ID: %s)", status_id)
         
         if not group_id_int:
             flash('Некорректная группа.', 'danger')
@@ -650,13 +1023,13 @@ def practice_form():
             practice_leader_id = int(practice_leader)
             contract_id_value = contract if isinstance(contract, int) else int(contract)
         except (TypeError, ValueError):
-            current_app.logger.error("PRACTICE FORM: Invalid numeric values received.")
+            log.error("PRACTICE FORM: Invalid numeric values received.")
             flash('Некорректные данные формы. Проверьте выбранные значения.', 'danger')
             return redirect(url_for('main.practice_form'))
         
-        current_student_record = find_student_for_user(current_user)
+        current_student_record = find_student_for_user_cached(current_user)
         if not current_student_record:
-            current_app.logger.warning(f"PRACTICE FORM: No student record found for user '{current_user.username}'. Creating new profile.")
+            log.warning("PRACTICE FORM: No student record found for user '%s'. Creating new profile.", current_user.username)
             surname, name, patronymic = parse_user_full_name(current_user.username)
             current_student_record = Student(
                 name=name or current_user.username,
@@ -665,10 +1038,11 @@ def practice_form():
                 group_id=group_id_int
             )
             db.session.add(current_student_record)
-            db.session.commit()
-            current_app.logger.info(f"PRACTICE FORM: Created student record #{current_student_record.id} for user '{current_user.username}'")
+            # flush выдаёт id студента без фиксации: профиль и заявка сохраняются одной транзакцией
+            db.session.flush()
+            log.info("PRACTICE FORM: Created student record #%s for user '%s'", current_student_record.id, current_user.username)
         else:
-            current_app.logger.info(f"PRACTICE FORM: Found student record: {current_student_record.id}")
+            log.info("PRACTICE FORM: Found student record: %s", current_student_record.id)
         
         # Create the form
         ask_form = AskForm(
@@ -678,108 +1052,113 @@ def practice_form():
             responsible_user_id=current_user.id,  # Current student is responsible
             consultant_leader_id=consultant_leader_id,
             practice_leader_id=practice_leader_id,
-            status_id=status.id,
-            student_id=current_student_record.id  # Use the actual student record ID
+            status_id=status_id,
+            student_id=current_student_record.id,  # Use the actual student record ID
+            # Контакты хранятся в самой заявке, а не в cookie-сессии
+            phone_number=phone_number,
+            email=email
         )
         
         db.session.add(ask_form)
         db.session.commit()
+        if use_custom_org:
+            # Новые организация и договор вставлены напрямую, минуя сервисы
+            invalidate_reference_cache('organizations', 'contracts')
         
-        current_app.logger.info(f"PRACTICE FORM: Form created successfully with ID: {ask_form.id}")
-        current_app.logger.info(f"PRACTICE FORM: Form linked to student: {current_student_record.id} ({current_student_record.name})")
+        log.info("PRACTICE FORM: Form created successfully with ID: %s", ask_form.id)
+        log.info("PRACTICE FORM: Form linked to student: %s (%s)", current_student_record.id, current_student_record.name)
         
         try:
             flash('Заявка на практику успешно отправлена!', 'success')
-            current_app.logger.info(f"PRACTICE FORM: Form submitted successfully by user '{current_user.username}'")
-            
-            # Generate PDF
-            current_app.logger.info("PRACTICE FORM: Generating PDF...")
-            pdf = generate_practice_pdf(ask_form)
-            current_app.logger.info("PRACTICE FORM: PDF generated successfully")
+            log.info("PRACTICE FORM: Form submitted successfully by user '%s'", current_user.username)
             
-            # Return PDF file
-            return send_file(
-                BytesIO(pdf),
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name='practice_application.pdf'
-            )
+            # Конвертация DOCX -> PDF занимает секунды, поэтому выполняется в фоне,
+            # а студент забирает готовый файл по ссылке на скачивание
+            log.info("PRACTICE FORM: Scheduling PDF generation...")
+            submit_practice_pdf(ask_form.id)
+            flash('Заявление в PDF формируется и скоро будет доступно для скачивания в списке заявок.', 'info')
+            return redirect(url_for('main.student_dashboard'), code=303)
             
         except Exception as e:
-            current_app.logger.error(f"PRACTICE FORM ERROR: Exception during form processing: {str(e)}")
-            current_app.logger.error(f"PRACTICE FORM ERROR: Exception type: {type(e).__name__}")
-            import traceback
-            current_app.logger.error(f"PRACTICE FORM ERROR: Traceback: {traceback.format_exc()}")
+            log.error("PRACTICE FORM ERROR: Exception during form processing: %s", e)
+            log.error("PRACTICE FORM ERROR: Exception type: %s", type(e).__name__)
+            log.error("PRACTICE FORM ERROR: Traceback: %s", traceback.format_exc())
             flash('Произошла ошибка при отправке заявки. Попробуйте снова.', 'danger')
             return redirect(url_for('main.practice_form'))
     
     # GET request - show form
-    current_app.logger.info("PRACTICE FORM: Processing GET request - showing form")
+    log.info("PRACTICE FORM: Processing GET request - showing form")
     
     # Get current student data
-    current_student = find_student_for_user(current_user)
+    current_student = find_student_for_user_cached(current_user)
     if current_student:
-        current_app.logger.info(f"PRACTICE FORM: Current student: {current_student.id}")
+        log.info("PRACTICE FORM: Current student: %s", current_student.id)
     else:
-        current_app.logger.info("PRACTICE FORM: Current student profile not found for pre-fill")
+        log.info("PRACTICE FORM: Current student profile not found for pre-fill")
     assigned_consultant_id = None
     if current_student and current_student.group_id:
-        consultant_assignment = ConsultantGroup.query.filter_by(group_id=current_student.group_id).first()
-        if consultant_assignment:
-            assigned_consultant_id = consultant_assignment.consultant_id
-            current_app.logger.info(f"PRACTICE FORM: Found consultant assignment for group {current_student.group_id}: {assigned_consultant_id}")
-    
-    # Get default group (722-1)
-    default_group = Group.query.filter_by(name='722-1').first()
+        assigned_consultant_id = db.session.execute(
+            select(ConsultantGroup.consultant_id).where(ConsultantGroup.group_id == current_student.group_id).limit(1)
+        ).scalar()
+        if assigned_consultant_id:
+            log.info("PRACTICE FORM: Found consultant assignment for group %s: %s", current_student.group_id, assigned_consultant_id)
+    
+    # Справочники формы кэшируются по версии таблиц (см. _practice_form_options);
+    # группу по умолчанию (722-1) и запасной вариант берём из кэшированного списка
+    options = _practice_form_options(_practice_form_options_version(
+        _role_id('преподаватель'), _role_id('преподаватель консультант')
+    ))
+    groups = options['groups']
+    default_group = next((group for group in groups if group['name'] == '722-1'), None)
     if not default_group:
         # Don't create here, it should be created in create_defaults.py
-        current_app.logger.warning("PRACTICE FORM: Group 722-1 not found, using fallback")
+        log.warning("PRACTICE FORM: Group 722-1 not found, using fallback")
         flash('Группа 722-1 не найдена в базе данных', 'warning')
-        default_group = Group.query.first()  # Get any group as fallback
+        default_group = groups[0] if groups else None  # Get any group as fallback
     else:
-        current_app.logger.info(f"PRACTICE FORM: Default group found: {default_group.name}")
+        log.info("PRACTICE FORM: Default group found: %s", default_group['name'])
     
     # Get data for form dropdowns
     try:
-        practice_types = PracticeType.query.all()
-        groups = Group.query.all()
-        contracts = Contract.query.join(Organization, Contract.organization_id == Organization.id).all()
-        students = Student.query.all()
-        consultant_users = User.query.join(Role, User.role_id == Role.id).filter(Role.name == 'преподаватель консультант').all()
-        practice_leaders = User.query.join(Role, User.role_id == Role.id).filter(Role.name == 'преподаватель').all()
+        # Список всех студентов выводится только если профиль текущего не найден.
+        # Строки читаются серверным курсором пачками прямо во время рендера шаблона,
+        # без загрузки всей таблицы в память ORM-объектами
+        students = [] if current_student else db.session.execute(
+            select(Student.id, Student.surname, Student.name, Student.patronymic)
+            .execution_options(yield_per=STUDENT_OPTIONS_BATCH)
+        )
+        consultant_users = options['consultants']
         
-        current_app.logger.info(f"PRACTICE FORM: Data loaded:")
-        current_app.logger.info(f"  - practice_types: {len(practice_types)}")
-        current_app.logger.info(f"  - groups: {len(groups)}")
-        current_app.logger.info(f"  - contracts: {len(contracts)}")
-        current_app.logger.info(f"  - students: {len(students)}")
-        current_app.logger.info(f"  - consultants: {len(consultant_users)}")
-        current_app.logger.info(f"  - practice leaders: {len(practice_leaders)}")
+        if log.isEnabledFor(logging.INFO):
+            log.info("PRACTICE FORM: Data loaded:")
+            log.info("  - groups: %s", len(groups))
+            log.info("  - students: %s", 'current' if current_student else 'streamed')
+            log.info("  - consultants: %s", len(consultant_users))
         
-        current_app.logger.info("PRACTICE FORM: Rendering form template")
+        log.info("PRACTICE FORM: Rendering form template")
         return render_template('practice_form.html', 
-                              practice_types=practice_types,
+                              practice_type_options=options['practice_types'],
                               groups=groups,
-                              contracts=contracts,
+                              contract_options=options['contracts'],
                               students=students,
                               consultants=consultant_users,
-                              practice_leaders=practice_leaders,
+                              practice_leader_options=options['practice_leaders'],
                               current_student=current_student,
                               default_group=default_group,
                               assigned_consultant_id=assigned_consultant_id)
                               
     except Exception as e:
-        current_app.logger.error(f"PRACTICE FORM ERROR: Exception during GET request: {str(e)}")
-        current_app.logger.error(f"PRACTICE FORM ERROR: Exception type: {type(e).__name__}")
-        import traceback
-        current_app.logger.error(f"PRACTICE FORM ERROR: Traceback: {traceback.format_exc()}")
+        log.error("PRACTICE FORM ERROR: Exception during GET request: %s", e)
+        log.error("PRACTICE FORM ERROR: Exception type: %s", type(e).__name__)
+        log.error("PRACTICE FORM ERROR: Traceback: %s", traceback.format_exc())
         flash('Произошла ошибка при загрузке формы. Попробуйте снова.', 'danger')
         return redirect(url_for('main.index'))
 
 @main.route('/view-form/<int:form_id>')
 @login_required
 def view_form(form_id):
-    ask_form = AskForm.query.get_or_404(form_id)
+    # Все связи, которые выводит view_form.html, загружаются одним запросом
+    ask_form = _get_ask_form_or_404(form_id)
     
     # Check permissions
     allowed_user_ids = {
@@ -794,14 +1173,30 @@ def view_form(form_id):
     return render_template('view_form.html', ask_form=ask_form, diary=ask_form.diary)
 
 
+@main.route('/view-form/<int:form_id>/print')
+@login_required
+def print_form(form_id):
+    """HTML-версия заявления для просмотра и печати без конвертации DOCX -> PDF."""
+    ask_form = _get_ask_form_or_404(form_id)
+    
+    allowed_user_ids = {
+        ask_form.responsible_user_id,
+        ask_form.consultant_leader_id,
+        ask_form.practice_leader_id
+    }
+    if (not current_user.is_teacher and not current_user.is_consultant and current_user.id not in allowed_user_ids):
+        flash('У вас нет доступа к этой форме', 'danger')
+        return redirect(url_for('main.index'))
+    
+    return render_template('practice_application_print.html', ask_form=ask_form, data=_collect_pdf_data(ask_form))
+
+
 @main.route('/practice-diary/<int:ask_form_id>', methods=['GET', 'POST'])
 @login_required
 def practice_diary(ask_form_id):
-    ask_form = AskForm.query.get_or_404(ask_form_id)
+    ask_form = _get_ask_form_or_404(ask_form_id)
     
-    is_owner = current_user.is_student and ask_form.responsible_user_id == current_user.id
-    is_consultant_for_form = current_user.is_consultant and current_user.id == ask_form.consultant_leader_id
-    is_practice_leader_for_form = current_user.is_teacher and current_user.id == ask_form.practice_leader_id
+    is_owner, is_consultant_for_form, is_practice_leader_for_form = _diary_access(ask_form)
     
     if not (is_owner or is_consultant_for_form or is_practice_leader_for_form):
         flash('У вас нет доступа к этому дневнику.', 'danger')
@@ -816,7 +1211,6 @@ def practice_diary(ask_form_id):
         )
         db.session.add(diary)
         db.session.commit()
-        diary = ask_form.diary
     elif not diary and request.method == 'POST' and is_owner:
         diary = PracticeDiary(
             ask_form_id=ask_form.id,
@@ -866,7 +1260,8 @@ def practice_diary(ask_form_id):
 @main.route('/practice-diary/<int:ask_form_id>/sign/<string:role>', methods=['POST'])
 @login_required
 def practice_diary_sign(ask_form_id, role):
-    ask_form = AskForm.query.get_or_404(ask_form_id)
+    # Для подписи нужен только дневник — подгружаем его тем же запросом
+    ask_form = AskForm.query.options(joinedload(AskForm.diary)).filter(AskForm.id == ask_form_id).first_or_404()
     diary = ask_form.diary
     
     if not diary:
@@ -874,7 +1269,8 @@ def practice_diary_sign(ask_form_id, role):
         return redirect(request.referrer or url_for('main.view_form', form_id=ask_form_id))
     
     signature_text = f"Подписано {current_user.username}"
-    now = datetime.utcnow()
+    # Время подписи ставит сервер БД — одинаково для всех узлов кластера
+    now = utcnow()
     
     if role == 'student':
         if ask_form.responsible_user_id != current_user.id:
@@ -908,16 +1304,14 @@ def practice_diary_sign(ask_form_id, role):
 @main.route('/practice-diary/<int:ask_form_id>/download/<string:file_format>')
 @login_required
 def practice_diary_download(ask_form_id, file_format):
-    ask_form = AskForm.query.get_or_404(ask_form_id)
+    ask_form = _get_ask_form_or_404(ask_form_id)
     diary = ask_form.diary
     
     if not diary:
         flash('Дневник ещё не заполнен студентом.', 'warning')
         return redirect(request.referrer or url_for('main.practice_diary', ask_form_id=ask_form_id))
     
-    is_owner = current_user.is_student and ask_form.responsible_user_id == current_user.id
-    is_consultant_for_form = current_user.is_consultant and current_user.id == ask_form.consultant_leader_id
-    is_practice_leader_for_form = current_user.is_teacher and current_user.id == ask_form.practice_leader_id
+    is_owner, is_consultant_for_form, is_practice_leader_for_form = _diary_access(ask_form)
     
     if not (is_owner or is_consultant_for_form or is_practice_leader_for_form):
         flash('У вас нет доступа к этому дневнику.', 'danger')
@@ -926,39 +1320,46 @@ def practice_diary_download(ask_form_id, file_format):
     temp_dir = None
     response = None
     try:
-        docx_path, temp_dir = prepare_practice_diary_docx(ask_form)
         filename_base = f"practice_diary_{ask_form.id}"
         
         if file_format == 'docx':
-            with open(docx_path, 'rb') as f:
-                doc_bytes = f.read()
+            # DOCX отдаётся прямо из памяти; временный файл нужен только конвертеру в PDF
+            doc_buffer = BytesIO()
+            build_practice_diary_document(ask_form, diary).save(doc_buffer)
+            doc_buffer.seek(0)
             response = send_file(
-                BytesIO(doc_bytes),
+                doc_buffer,
                 mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
                 as_attachment=True,
                 download_name=f"{filename_base}.docx"
             )
         elif file_format == 'pdf':
-            pdf_content = convert_to_pdf(docx_path)
-            if isinstance(pdf_content, bytes):
-                pdf_bytes = pdf_content
-            elif isinstance(pdf_content, str):
-                with open(pdf_content, 'rb') as f:
-                    pdf_bytes = f.read()
-            else:
+            docx_path, temp_dir = prepare_practice_diary_docx(ask_form)
+            # Данные из БД больше не нужны — возвращаем соединение в пул до долгой конвертации
+            db.session.close()
+            # PDF пишется рядом с DOCX и отдаётся с диска потоком, без чтения в память
+            pdf_path = _submit_conversion(docx_path, os.path.join(temp_dir, f"{filename_base}.pdf")).result()
+            if not isinstance(pdf_path, str):
                 raise ValueError("Не удалось сформировать PDF-файл.")
             
+            # Файловый объект, а не путь: временный PDF не должен уходить в X-Sendfile,
+            # его папка удаляется сразу после отдачи
             response = send_file(
-                BytesIO(pdf_bytes),
+                open(pdf_path, 'rb'),
                 mimetype='application/pdf',
                 as_attachment=True,
                 download_name=f"{filename_base}.pdf"
             )
+            # Без direct_passthrough Werkzeug оборачивает тело в ClosingIterator и вызывает
+            # call_on_close после закрытия файла; тело по-прежнему читается блоками
+            response.direct_passthrough = False
+            stream_dir, temp_dir = temp_dir, None
+            response.call_on_close(lambda: shutil.rmtree(stream_dir, ignore_errors=True))
         else:
             flash('Неподдерживаемый формат файла.', 'danger')
             return redirect(request.referrer or url_for('main.practice_diary', ask_form_id=ask_form_id))
     except Exception as e:
-        current_app.logger.error(f"PRACTICE DIARY DOWNLOAD ERROR: {str(e)}")
+        current_app.logger.error("PRACTICE DIARY DOWNLOAD ERROR: %s", e)
         flash('Не удалось сформировать дневник. Обратитесь к администратору.', 'danger')
         return redirect(request.referrer or url_for('main.practice_diary', ask_form_id=ask_form_id))
     finally:
@@ -967,6 +1368,106 @@ def practice_diary_download(ask_form_id, file_format):
     
     return response
 
+
+# Сколько конвертаций DOCX → PDF выполняется одновременно в одном процессе
+OFFICE_CONVERT_WORKERS = 4
+
+# Общий пул конвертаций: у каждого потока свой профиль LibreOffice, который живёт
+# всё время работы процесса, поэтому soffice не создаёт профиль заново на каждый файл
+_convert_executor = None
+_convert_executor_lock = threading.Lock()
+_office_profiles = queue.Queue()
+
+
+def _get_convert_executor():
+    global _convert_executor
+    with _convert_executor_lock:
+        if _convert_executor is None:
+            workers = min(OFFICE_CONVERT_WORKERS, os.cpu_count() or 1)
+            for _ in range(workers):
+                _office_profiles.put(tempfile.mkdtemp(prefix='soffice_profile_'))
+            _convert_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='office-convert')
+        return _convert_executor
+
+
+def _convert_with_profile(docx_path, pdf_output_path=None):
+    profile_dir = _office_profiles.get()
+    try:
+        return convert_to_pdf(docx_path, pdf_output_path, office_profile_dir=profile_dir)
+    finally:
+        _office_profiles.put(profile_dir)
+
+
+def _submit_conversion(docx_path, pdf_output_path=None):
+    """Поставить конвертацию DOCX в PDF в общий пул; возвращает Future с результатом convert_to_pdf."""
+    return _get_convert_executor().submit(_convert_with_profile, docx_path, pdf_output_path)
+
+
+@main.route('/consultant/groups/<int:group_id>/diaries.pdf')
+@login_required
+def consultant_group_diaries_pdf(group_id):
+    """
+    Все заполненные дневники группы консультанта одним PDF.
+    DOCX собираются последовательно (нужна сессия БД), а конвертация идёт параллельно
+    в общем пуле конвертаций.
+    """
+    if not current_user.is_consultant:
+        flash('У вас нет доступа к этой функции', 'danger')
+        return redirect(url_for('main.index'))
+    
+    ask_forms = (
+        AskForm.query
+        .options(*_ask_form_details_options())
+        .join(PracticeDiary, PracticeDiary.ask_form_id == AskForm.id)
+        .filter(
+            AskForm.consultant_leader_id == current_user.id,
+            AskForm.group_id == group_id
+        )
+        .order_by(AskForm.id)
+        .all()
+    )
+    if not ask_forms:
+        flash('В группе пока нет заполненных дневников.', 'warning')
+        return redirect(url_for('main.consultant_dashboard', group_id=group_id))
+    
+    temp_dirs = []
+    futures = []
+    try:
+        docx_paths = []
+        for ask_form in ask_forms:
+            docx_path, temp_dir = prepare_practice_diary_docx(ask_form)
+            temp_dirs.append(temp_dir)
+            docx_paths.append(docx_path)
+        # Конвертация не обращается к БД — соединение возвращается в пул заранее
+        db.session.close()
+        
+        writer = PdfWriter()
+        futures = [_submit_conversion(docx_path) for docx_path in docx_paths]
+        for future in futures:
+            writer.append(BytesIO(future.result()))
+        output = BytesIO()
+        writer.write(output)
+        output.seek(0)
+    except Exception as e:
+        current_app.logger.error("GROUP DIARIES PDF ERROR: %s", e)
+        flash('Не удалось сформировать дневники. Обратитесь к администратору.', 'danger')
+        return redirect(url_for('main.consultant_dashboard', group_id=group_id))
+    finally:
+        # После ошибки остальные конвертации не нужны: снимаем ещё не начатые и ждём
+        # уже запущенные, чтобы не удалять их входные файлы во время работы
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        for temp_dir in temp_dirs:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    return send_file(
+        output,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f"practice_diaries_group_{group_id}.pdf"
+    )
+
 @main.route('/update-form-status/<int:form_id>/<int:status>')
 @login_required
 def update_form_status(form_id, status):
@@ -976,15 +1477,10 @@ def update_form_status(form_id, status):
         return redirect(url_for('main.index'))
     
     ask_form = AskForm.query.get_or_404(form_id)
-    status_obj = Status.query.filter_by(name=str(status)).first()
-    
-    if not status_obj:
-        status_obj = Status(name=str(status))
-        db.session.add(status_obj)
-        db.session.commit()
-    
-    ask_form.status = status_obj
+    ask_form.status_id = _status_id(str(status))
     db.session.commit()
+    # Одобрение или его отмена меняет число занятых слотов договора
+    invalidate_reference_cache('contracts')
     
     if status == 0:
         flash('Форма отклонена. Студент должен заполнить её заново.', 'warning')
@@ -993,39 +1489,32 @@ def update_form_status(form_id, status):
     
     return redirect(url_for('main.view_form', form_id=form_id))
 
-def generate_practice_pdf(ask_form):
-    # Path to template DOCX
-    template_path = os.path.join(current_app.root_path, 'ShABLON_732_grupp_Zayavlenie_na_prokhozhdenie_praktiki-1.docx')
-    
-    # Get related data
-    student = Student.query.get(ask_form.student_id)
-    group = Group.query.get(ask_form.group_id)
-    practice_type = PracticeType.query.get(ask_form.practice_type_id)
-    
-    # Check if using custom organization
-    use_custom_org = session.get('custom_organization', False)
-    
-    if use_custom_org:
-        # Use the custom organization data from session
-        organization_name = session.get('organization_name', '')
-        organization_address = session.get('organization_address', '')
-    else:
-        # Use organization from the selected contract
-        contract = Contract.query.get(ask_form.contract_id)
-        organization = Organization.query.get(contract.organization_id)
-        organization_name = organization.name
-        organization_address = organization.address
-    
-    consultant = User.query.get(ask_form.consultant_leader_id)
-    practice_leader = User.query.get(ask_form.practice_leader_id)
+def _collect_pdf_data(ask_form):
+    """Собрать значения полей заявления на практику (общие для DOCX/PDF и HTML-версии)."""
+    # Студент, группа, руководитель, организация договора и контакты из заявки
+    # загружаются одним SELECT с JOIN вместо отдельного запроса на каждую сущность.
+    # Собственная организация студента тоже сохраняется в Organization/Contract,
+    # поэтому отдельная ветка для неё не нужна.
+    stmt = (
+        select(Student, Group, User, Organization, AskForm.phone_number, AskForm.email)
+        .select_from(AskForm)
+        .join(Student, AskForm.student_id == Student.id)
+        .join(Group, AskForm.group_id == Group.id)
+        .join(User, AskForm.practice_leader_id == User.id)
+        .join(Contract, AskForm.contract_id == Contract.id)
+        .join(Organization, Contract.organization_id == Organization.id)
+        .where(AskForm.id == ask_form.id)
+    )
+    student, group, practice_leader, organization, phone_number, email = db.session.execute(stmt).one()
     
-    # Get phone number and email from session
-    phone_number = session.get('phone_number', '+7XXXXXXXXXX')
-    email = session.get('email', 'student@example.com')
+    organization_name = organization.name or ''
+    organization_address = organization.address or ''
+    phone_number = phone_number or '+7XXXXXXXXXX'
+    email = email or 'student@example.com'
     
     # Prepare data for template filling
     full_student_name = f"{student.surname} {student.name} {student.patronymic}"
-    today_date = datetime.now().strftime('%d.%m.%Y')
+    today_date = _today_str()
     
     # Data for filling the docx template
     data = {
@@ -1038,19 +1527,162 @@ def generate_practice_pdf(ask_form):
         'РУКОВОДИТЕЛЬ': practice_leader.username,
         'ДАТА': today_date
     }
+    return data
+
+def generate_practice_pdf(ask_form):
+    # Path to template DOCX
+    template_path = os.path.join(current_app.root_path, 'ShABLON_732_grupp_Zayavlenie_na_prokhozhdenie_praktiki-1.docx')
+    data = _collect_pdf_data(ask_form)
+    # Все данные собраны — не держим соединение из пула, пока идёт конвертация
+    db.session.close()
     
     try:
         # Process the template and generate PDF
-        pdf_data = process_template(template_path, data)
+        # Returns either the binary PDF data or a path to the PDF file
+        return process_template(template_path, data)
         
-        # If a string is returned (file path), read the file
-        if isinstance(pdf_data, str):
-            with open(pdf_data, 'rb') as f:
-                return f.read()
+    except Exception as e:
+        current_app.logger.error("Error generating PDF: %s", e)
+        raise Exception(f"Ошибка при генерации PDF: {str(e)}") 
+
+# Фоновая генерация PDF-заявлений: пул потоков на процесс, готовые файлы — на диске.
+# Реестр задач и ошибок свой у каждого процесса (узла кластера): общим состоянием
+# служит только готовый файл в PDF_OUTPUT_FOLDER
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+_PDF_JOBS = {}
+_PDF_FAILURES = OrderedDict()
+_PDF_JOBS_LOCK = threading.Lock()
+# Сколько последних ошибок генерации хранится до того, как их покажут пользователю
+PDF_FAILURES_LIMIT = 256
+
+
+def _get_pdf_executor():
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('PDF_WORKERS', 2),
+                thread_name_prefix='practice-pdf'
+            )
+        return _pdf_executor
+
+
+def practice_pdf_path(form_id):
+    """Путь к сформированному PDF-заявлению заявки."""
+    output_folder = current_app.config.get('PDF_OUTPUT_FOLDER', 'generated_pdfs')
+    if not os.path.isabs(output_folder):
+        output_folder = os.path.join(current_app.root_path, output_folder)
+    return os.path.join(output_folder, f"practice_application_{form_id}.pdf")
+
+
+def _send_generated_pdf(pdf_path):
+    """
+    Отдать сформированный PDF. За nginx (PDF_ACCEL_REDIRECT_PREFIX) файл передаёт сам
+    прокси через X-Accel-Redirect, а воркер только проверяет права; при USE_X_SENDFILE
+    send_file выставляет X-Sendfile для Apache/lighttpd.
+    """
+    accel_prefix = current_app.config.get('PDF_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = current_app.response_class(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{os.path.basename(pdf_path)}"
+        response.headers['Content-Disposition'] = 'attachment; filename=practice_application.pdf'
+        return response
+    
+    # send_file отдаёт файл с диска потоково и поддерживает условные запросы
+    return send_file(
+        pdf_path,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name='practice_application.pdf',
+        conditional=True
+    )
+
+
+def _generate_practice_pdf_to_disk(app, form_id):
+    """Сформировать PDF заявки и атомарно сохранить его на диск (выполняется в фоне)."""
+    with app.app_context():
+        ask_form = db.session.get(AskForm, form_id)
+        if not ask_form:
+            raise ValueError(f"Заявка {form_id} не найдена")
         
-        # Otherwise, the binary data was returned directly
-        return pdf_data
+        pdf = generate_practice_pdf(ask_form)
+        target_path = practice_pdf_path(form_id)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
         
-    except Exception as e:
-        current_app.logger.error(f"Error generating PDF: {str(e)}")
-        raise Exception(f"Ошибка при генерации PDF: {str(e)}") 
\ No newline at end of file
+        # Уникальное временное имя: параллельные генерации (в том числе на разных
+        # узлах с общей папкой) не пишут в один файл, а os.replace атомарен
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target_path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if isinstance(pdf, str):
+                    with open(pdf, 'rb') as source:
+                        shutil.copyfileobj(source, f)
+                else:
+                    f.write(pdf)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        app.logger.info("PRACTICE PDF: Generated %s", target_path)
+        return target_path
+
+
+def _finish_pdf_job(form_id, future):
+    """Убрать завершённую задачу из реестра; ошибку запомнить до следующего опроса."""
+    with _PDF_JOBS_LOCK:
+        if _PDF_JOBS.get(form_id) is future:
+            del _PDF_JOBS[form_id]
+        error = future.exception()
+        if error is not None:
+            _PDF_FAILURES[form_id] = error
+            _PDF_FAILURES.move_to_end(form_id)
+            while len(_PDF_FAILURES) > PDF_FAILURES_LIMIT:
+                _PDF_FAILURES.popitem(last=False)
+
+
+def submit_practice_pdf(form_id):
+    """Поставить генерацию PDF заявки в очередь, если она ещё не выполняется на этом узле."""
+    with _PDF_JOBS_LOCK:
+        future = _PDF_JOBS.get(form_id)
+        if future is not None:
+            return future
+        _PDF_FAILURES.pop(form_id, None)
+        app = current_app._get_current_object()
+        future = _get_pdf_executor().submit(_generate_practice_pdf_to_disk, app, form_id)
+        _PDF_JOBS[form_id] = future
+    future.add_done_callback(functools.partial(_finish_pdf_job, form_id))
+    return future
+
+
+@main.route('/practice-form/<int:form_id>/pdf')
+@login_required
+def download_practice_pdf(form_id):
+    ask_form = AskForm.query.get_or_404(form_id)
+    allowed_user_ids = {
+        ask_form.responsible_user_id,
+        ask_form.consultant_leader_id,
+        ask_form.practice_leader_id
+    }
+    if current_user.id not in allowed_user_ids:
+        flash('У вас нет доступа к этой заявке', 'danger')
+        return redirect(url_for('main.index'))
+    
+    with _PDF_JOBS_LOCK:
+        error = _PDF_FAILURES.pop(form_id, None)
+        running = form_id in _PDF_JOBS
+    if error is not None:
+        current_app.logger.error("PRACTICE PDF ERROR: form %s: %s", form_id, error)
+        flash('Не удалось сформировать PDF заявления. Попробуйте позже.', 'danger')
+        return redirect(url_for('main.student_dashboard'))
+    
+    pdf_path = practice_pdf_path(form_id)
+    if not running and os.path.exists(pdf_path):
+        return _send_generated_pdf(pdf_path)
+    
+    if not running:
+        # Состояние задач видно только своему узлу: опрос, попавший на другой узел,
+        # при отсутствии готового файла запустит генерацию там (запись файла атомарна)
+        submit_practice_pdf(form_id)
+    flash('PDF заявления ещё формируется. Обновите страницу через несколько секунд.', 'info')
+    return redirect(url_for('main.student_dashboard'))
@@ -2,12 +2,15 @@
 import argparse
 import json
 import os
+import select
 import subprocess
 import sys
 import time
 import signal
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +28,9 @@ DEFAULT_BASE_PORT = 5000
 DEFAULT_NODE_COUNT = 2
 DEFAULT_PROXY_PORT = 8000
 DEFAULT_ALGORITHM = "round_robin"
+# Output of every node and the proxy goes to its own file here
+LOG_DIR = "logs"
+LOG_TAIL_LINES = 20
 
 # Global process tracking
 processes = []
@@ -43,24 +49,49 @@ def signal_handler(sig, frame):
     logger.info("All processes terminated. Exiting.")
     sys.exit(0)
 
-def start_server(port, server_id, cluster_nodes):
-    """Start a server instance"""
+def open_process_log(name):
+    """Open (append) the output log of a child process"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    path = os.path.join(LOG_DIR, f"{name}.out")
+    return path, open(path, 'ab')
+
+def read_log_tail(path, lines=LOG_TAIL_LINES):
+    """Last lines of a child process log"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 8192, 0))
+            tail = f.read().decode('utf-8', errors='replace').splitlines()
+    except OSError:
+        return ""
+    return "\n".join(tail[-lines:])
+
+def build_cluster_env(cluster_nodes):
+    """Environment shared by all server nodes (CLUSTER_NODES is encoded once)"""
     env = os.environ.copy()
-    env["PORT"] = str(port)
-    env["SERVER_ID"] = server_id
     env["CLUSTER_MODE"] = "true"
     env["CLUSTER_NODES"] = json.dumps(cluster_nodes)
+    return env
+
+def start_server(port, server_id, cluster_env):
+    """Start a server instance"""
+    env = dict(cluster_env)
+    env["PORT"] = str(port)
+    env["SERVER_ID"] = server_id
     
     logger.info(f"Starting server {server_id} on port {port}")
     
-    # Start the server process
-    process = subprocess.Popen(
-        [sys.executable, "run_server.py"],
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    # Start the server process; output goes to a file, an undrained pipe
+    # would block the server once the pipe buffer fills up
+    log_path, log_file = open_process_log(server_id)
+    with log_file:
+        process = subprocess.Popen(
+            [sys.executable, "run_server.py"],
+            env=env,
+            stdout=log_file,
+            stderr=subprocess.STDOUT
+        )
+    process.log_path = log_path
     
     processes.append(process)
     return process
@@ -84,28 +115,67 @@ def start_proxy(proxy_port, backend_nodes, algorithm, sticky_sessions=False):
     logger.info(f"Algorithm: {algorithm}")
     
     # Start the proxy process
-    process = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    log_path, log_file = open_process_log("proxy")
+    with log_file:
+        process = subprocess.Popen(
+            cmd,
+            stdout=log_file,
+            stderr=subprocess.STDOUT
+        )
+    process.log_path = log_path
     
     processes.append(process)
     return process
 
-def wait_for_server(url, max_retries=10, retry_delay=1):
-    """Wait for a server to become available"""
+def report_exited_processes(reported):
+    """Log processes that have terminated since the last check"""
+    for i, p in enumerate(processes):
+        if p.pid in reported or p.poll() is None:
+            continue
+        reported.add(p.pid)
+        logger.error(f"Process {i} terminated with exit code {p.returncode}")
+        output = read_log_tail(p.log_path)
+        if output:
+            logger.error(f"Output ({p.log_path}):\n{output}")
+
+def monitor_processes():
+    """Block until Ctrl+C, reporting child processes as soon as they exit"""
+    reported = set()
+    if not hasattr(signal, 'SIGCHLD'):
+        # No SIGCHLD on Windows: fall back to polling
+        while True:
+            report_exited_processes(reported)
+            time.sleep(1)
+    
+    # SIGCHLD wakes the main thread through a pipe, so child exits are seen
+    # immediately and nothing runs while all nodes are healthy
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    signal.set_wakeup_fd(write_fd)
+    signal.signal(signal.SIGCHLD, lambda sig, frame: None)
+    
+    while True:
+        report_exited_processes(reported)
+        select.select([read_fd], [], [])
+        try:
+            while os.read(read_fd, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+def wait_for_server(url, max_retries=10, retry_delay=0.05, session=requests):
+    """Wait for a server to become available (exponential backoff, capped at 2s)"""
     for i in range(max_retries):
         try:
-            response = requests.get(f"{url}/health", timeout=2)
+            response = session.get(f"{url}/health", timeout=2)
             if response.status_code == 200:
                 logger.info(f"Server at {url} is ready")
                 return True
         except Exception:
             pass
         
-        time.sleep(retry_delay)
+        time.sleep(min(retry_delay * 2 ** i, 2.0))
     
     logger.warning(f"Server at {url} did not become ready in time")
     return False
@@ -147,15 +217,20 @@ def main():
         backend_nodes.append(f"http://localhost:{port}")
     
     # Start server nodes
+    cluster_env = build_cluster_env(backend_nodes)
     for i in range(args.nodes):
         port = args.base_port + i
         server_id = f"server-{i+1}"
-        start_server(port, server_id, backend_nodes)
+        start_server(port, server_id, cluster_env)
     
-    # Wait for servers to start
+    # Wait for servers to start: all nodes are probed concurrently over one
+    # keep-alive session, so startup takes as long as the slowest node
     logger.info("Waiting for servers to start...")
-    for node in backend_nodes:
-        wait_for_server(node)
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=args.nodes, pool_maxsize=args.nodes)
+        session.mount("http://", adapter)
+        with ThreadPoolExecutor(max_workers=args.nodes) as executor:
+            list(executor.map(lambda node: wait_for_server(node, session=session), backend_nodes))
     
     # Start reverse proxy
     start_proxy(args.proxy_port, backend_nodes, args.algorithm, args.sticky_sessions)
@@ -165,19 +240,7 @@ def main():
     
     # Keep the script running until Ctrl+C
     try:
-        while True:
-            # Check if any process has terminated unexpectedly
-            for i, p in enumerate(processes):
-                if p.poll() is not None:
-                    exit_code = p.poll()
-                    stdout, stderr = p.communicate()
-                    logger.error(f"Process {i} terminated with exit code {exit_code}")
-                    if stdout:
-                        logger.error(f"Stdout: {stdout}")
-                    if stderr:
-                        logger.error(f"Stderr: {stderr}")
-            
-            time.sleep(1)
+        monitor_processes()
     except KeyboardInterrupt:
         signal_handler(signal.SIGINT, None)
 
@@ -8,6 +8,7 @@ from .practice_service import PracticeService
 from .organization_service import OrganizationService
 from .pdf_service import PDFService
 from .email_service import EmailService
+from .statistics_service import StatisticsService
 
 __all__ = [
     'UserService',
@@ -15,7 +16,8 @@ __all__ = [
     'PracticeService',
     'OrganizationService',
     'PDFService',
-    'EmailService'
+    'EmailService',
+    'StatisticsService'
 ]
 
 
@@ -1,11 +1,35 @@
 """
 Базовый сервис с общими методами
 """
-from typing import Optional, List, Dict, Any
+from datetime import datetime
+from typing import Optional, List, Dict, Any, NamedTuple
+from flask import current_app
+from sqlalchemy import select, func
+from sqlalchemy.orm import raiseload
 from extensions import db
 from models.base import BaseModel
 
 
+class Page(NamedTuple):
+    """Страница результатов (совместима с атрибутами Pagination из Flask-SQLAlchemy)"""
+    items: list
+    page: int
+    per_page: int
+    total: int
+    
+    @property
+    def pages(self) -> int:
+        return -(-self.total // self.per_page)
+    
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+    
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+
 class BaseService:
     """Базовый класс для всех сервисов"""
     
@@ -78,11 +102,86 @@ class BaseService:
                 else:
                     query = query.filter(getattr(self.model_class, key) == value)
         
-        return query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
+        # В разработке и тестах запрещаем ленивую загрузку связей,
+        # чтобы незамеченные N+1 запросы при сериализации падали сразу
+        if current_app.config.get('SQLALCHEMY_RAISELOAD', False):
+            query = query.options(raiseload('*'))
+        
+        page = max(page, 1)
+        if per_page <= 0:
+            per_page = 20
+        
+        # Считаем только id по тем же условиям, без подзапроса над полной выборкой
+        total = query.with_entities(func.count(self.model_class.id)).order_by(None).scalar()
+        items = (
+            query.order_by(self.model_class.id)
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+            .all()
         )
+        return Page(items=items, page=page, per_page=per_page, total=total)
+    
+    def _filter_conditions(self, table, filters: Dict[str, Any]) -> list:
+        """Условия WHERE по столбцам таблицы (как в get_paginated)"""
+        conditions = []
+        for key, value in filters.items():
+            if key in table.c:
+                column = table.c[key]
+                if isinstance(value, str):
+                    conditions.append(column.ilike(f'%{value}%'))
+                else:
+                    conditions.append(column == value)
+        return conditions
+    
+    def _list_statement(self, **filters):
+        """SELECT столбцов и условия для выборок в виде словарей"""
+        table = self.model_class.__table__
+        return select(table), self._filter_conditions(table, filters)
+    
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        """Преобразовать строку результата в словарь (формат как у to_dict)"""
+        return {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in row.items()
+        }
+    
+    def get_dicts(self, **filters) -> List[Dict[str, Any]]:
+        """Получить объекты в виде словарей без создания ORM-объектов"""
+        stmt, conditions = self._list_statement(**filters)
+        rows = db.session.execute(stmt.where(*conditions)).mappings()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def get_paginated_dicts(self, page: int = 1, per_page: int = 20, **filters) -> Dict[str, Any]:
+        """Получить страницу объектов в виде словарей без создания ORM-объектов"""
+        page = max(page, 1)
+        if per_page <= 0:
+            per_page = 20
+        
+        stmt, conditions = self._list_statement(**filters)
+        stmt = stmt.where(*conditions)
+        total = db.session.execute(
+            stmt.with_only_columns(func.count(self.model_class.__table__.c.id))
+        ).scalar()
+        rows = db.session.execute(
+            stmt.order_by(self.model_class.__table__.c.id)
+            .limit(per_page)
+            .offset((page - 1) * per_page)
+        ).mappings()
+        
+        result = Page(items=[self._row_to_dict(row) for row in rows],
+                      page=page, per_page=per_page, total=total)
+        return {
+            'items': result.items,
+            'total': result.total,
+            'pages': result.pages,
+            'has_next': result.has_next,
+            'has_prev': result.has_prev
+        }
+    
+    def get_version(self) -> str:
+        """Версия данных таблицы (количество строк и последнее изменение) для ETag"""
+        return combined_version(self)
     
     def exists(self, **filters) -> bool:
         """Проверить существование объекта"""
@@ -105,6 +204,23 @@ class BaseService:
         return query.count()
 
 
+def combined_version(*services: BaseService) -> str:
+    """
+    Общая версия таблиц нескольких сервисов для ETag — одним SELECT из скалярных
+    подзапросов (количество строк и последнее изменение каждой таблицы)
+    """
+    columns = []
+    for service in services:
+        table = service.model_class.__table__
+        columns.append(select(func.count(table.c.id)).scalar_subquery())
+        columns.append(select(func.max(table.c.updated_at)).scalar_subquery())
+    values = db.session.execute(select(*columns)).one()
+    return '-'.join(
+        f"{total}.{last_updated.timestamp() if last_updated else 0}"
+        for total, last_updated in zip(values[::2], values[1::2])
+    )
+
+
 
 
 
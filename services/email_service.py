@@ -71,11 +71,11 @@ class EmailService:
                 server.login(self.smtp_username, self.smtp_password)
                 server.send_message(msg)
             
-            current_app.logger.info(f"Email sent to {to_email}")
+            current_app.logger.info("Email sent to %s", to_email)
             return True
             
         except Exception as e:
-            current_app.logger.error(f"Error sending email to {to_email}: {str(e)}")
+            current_app.logger.error("Error sending email to %s: %s", to_email, e)
             return False
     
     def _attach_file(self, msg: MIMEMultipart, file_path: str):
@@ -91,7 +91,7 @@ class EmailService:
                 )
                 msg.attach(attachment)
         except Exception as e:
-            current_app.logger.error(f"Error attaching file {file_path}: {str(e)}")
+            current_app.logger.error("Error attaching file %s: %s", file_path, e)
     
     def send_application_notification(self, application_id: int, notification_type: str) -> bool:
         """Отправить уведомление о заявке"""
@@ -116,7 +116,7 @@ class EmailService:
             return False
             
         except Exception as e:
-            current_app.logger.error(f"Error sending application notification: {str(e)}")
+            current_app.logger.error("Error sending application notification: %s", e)
             return False
     
     def _get_teacher_emails(self, application: AskForm) -> List[str]:
@@ -326,5 +326,5 @@ class EmailService:
             
             return True
         except Exception as e:
-            current_app.logger.error(f"Email configuration test failed: {str(e)}")
+            current_app.logger.error("Email configuration test failed: %s", e)
             return False
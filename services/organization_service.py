@@ -1,13 +1,49 @@
 """
 Сервис для работы с организациями и договорами
 """
-from typing import Optional, List, Dict, Any
+import threading
+import time
+from typing import Optional, List, Dict, Any, Callable
 from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
 from .base_service import BaseService
 from models.organization import Organization, Contract
 from extensions import db
 
 
+# Справочные данные (организации, договоры) меняются редко, поэтому
+# сериализованные списки держим в памяти процесса ограниченное время.
+# Если передана версия данных (та же, что уходит клиенту в ETag), запись
+# действительна только для нее — новый ETag никогда не получит старое тело
+REFERENCE_CACHE_TTL = 60
+_reference_cache: Dict[str, tuple] = {}
+_reference_cache_lock = threading.Lock()
+
+
+def _get_cached_reference(key: str, loader: Callable[[], Any],
+                          version: Optional[str] = None) -> Any:
+    """Получить значение из кэша справочников или загрузить его заново"""
+    now = time.monotonic()
+    entry = _reference_cache.get(key)
+    if entry is not None and entry[0] > now and entry[1] == version:
+        return entry[2]
+    
+    value = loader()
+    with _reference_cache_lock:
+        _reference_cache[key] = (now + REFERENCE_CACHE_TTL, version, value)
+    return value
+
+
+def invalidate_reference_cache(*keys: str) -> None:
+    """Сбросить кэш справочников (все ключи, если не указаны)"""
+    with _reference_cache_lock:
+        if not keys:
+            _reference_cache.clear()
+        for key in keys:
+            _reference_cache.pop(key, None)
+
+
 class OrganizationService(BaseService):
     """Сервис для работы с организациями"""
     
@@ -33,6 +69,7 @@ class OrganizationService(BaseService):
                 description=description
             )
             organization.save()
+            invalidate_reference_cache('organizations')
             
             return organization
         except Exception as e:
@@ -51,6 +88,14 @@ class OrganizationService(BaseService):
         """Получить активные организации"""
         return Organization.get_active()
     
+    def get_active_organizations_data(self, version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Получить активные организации в виде словарей (с кэшированием по версии)"""
+        return _get_cached_reference(
+            'organizations',
+            lambda: self.get_dicts(is_active=True),
+            version
+        )
+    
     def get_organization_with_contracts(self, organization_id: int) -> Optional[Dict[str, Any]]:
         """Получить организацию с договорами"""
         organization = self.get_by_id(organization_id)
@@ -92,6 +137,7 @@ class OrganizationService(BaseService):
             organization = self.get_by_id(organization_id)
             if organization:
                 organization.update(is_active=False)
+                invalidate_reference_cache('organizations')
                 return True
             return False
         except Exception as e:
@@ -104,6 +150,7 @@ class OrganizationService(BaseService):
             organization = self.get_by_id(organization_id)
             if organization:
                 organization.update(is_active=True)
+                invalidate_reference_cache('organizations')
                 return True
             return False
         except Exception as e:
@@ -140,6 +187,7 @@ class ContractService(BaseService):
                 max_students=max_students
             )
             contract.save()
+            invalidate_reference_cache('contracts')
             
             return contract
         except Exception as e:
@@ -164,7 +212,7 @@ class ContractService(BaseService):
     
     def get_contract_with_details(self, contract_id: int) -> Optional[Dict[str, Any]]:
         """Получить договор с подробной информацией"""
-        contract = self.get_by_id(contract_id)
+        contract = db.session.get(Contract, contract_id, options=[joinedload(Contract.organization)])
         if not contract:
             return None
         
@@ -199,6 +247,7 @@ class ContractService(BaseService):
                 return False
             
             contract.update(date_end=new_end_date)
+            invalidate_reference_cache('contracts')
             return True
         except Exception as e:
             db.session.rollback()
@@ -210,6 +259,7 @@ class ContractService(BaseService):
             contract = self.get_by_id(contract_id)
             if contract:
                 contract.update(is_active=False)
+                invalidate_reference_cache('contracts')
                 return True
             return False
         except Exception as e:
@@ -222,6 +272,7 @@ class ContractService(BaseService):
             contract = self.get_by_id(contract_id)
             if contract:
                 contract.update(is_active=True)
+                invalidate_reference_cache('contracts')
                 return True
             return False
         except Exception as e:
@@ -237,6 +288,33 @@ class ContractService(BaseService):
         current_contracts = self.get_current_contracts()
         return [contract for contract in current_contracts if contract.has_available_slots()]
     
+    def get_available_contracts_data(self, version: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Получить доступные договоры в виде словарей (с кэшированием по версии)"""
+        return _get_cached_reference(
+            'contracts',
+            lambda: [contract.to_dict() for contract in self.get_available_contracts()],
+            version
+        )
+    
+    def get_boundary_version(self, expiring_days: Optional[int] = None) -> str:
+        """Ближайшие моменты, когда набор текущих (и истекающих) договоров изменится сам по себе.
+        
+        Строки договоров при этом не меняются, поэтому для ETag счетчиков и
+        max(updated_at) недостаточно: значение переходит к следующему договору,
+        как только наступает очередная граница.
+        """
+        now = datetime.utcnow()
+        boundaries = [
+            func.min(Contract.date_start).filter(Contract.date_start > now),
+            func.min(Contract.date_end).filter(Contract.date_end >= now)
+        ]
+        if expiring_days is not None:
+            boundaries.append(
+                func.min(Contract.date_end).filter(Contract.date_end > now + timedelta(days=expiring_days))
+            )
+        row = db.session.execute(select(*boundaries)).one()
+        return '-'.join(value.isoformat() if value else '0' for value in row)
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Получить статистику договоров"""
         total_contracts = self.count()
@@ -61,7 +61,7 @@ class PDFService:
             return pdf_data
             
         except Exception as e:
-            current_app.logger.error(f"Ошибка генерации PDF: {str(e)}")
+            current_app.logger.error("Ошибка генерации PDF: %s", e)
             raise e
     
     def _prepare_application_data(self, application: AskForm, custom_data: Dict[str, Any] = None) -> Dict[str, str]:
@@ -135,7 +135,7 @@ class PDFService:
             return file_path
             
         except Exception as e:
-            current_app.logger.error(f"Ошибка сохранения PDF: {str(e)}")
+            current_app.logger.error("Ошибка сохранения PDF: %s", e)
             raise e
     
     def generate_and_save_pdf(self, application_id: int, filename: str = None, 
@@ -151,7 +151,7 @@ class PDFService:
             return file_path
             
         except Exception as e:
-            current_app.logger.error(f"Ошибка генерации и сохранения PDF: {str(e)}")
+            current_app.logger.error("Ошибка генерации и сохранения PDF: %s", e)
             raise e
     
     def get_pdf_as_bytesio(self, application_id: int, custom_data: Dict[str, Any] = None) -> BytesIO:
@@ -160,7 +160,7 @@ class PDFService:
             pdf_data = self.generate_practice_application_pdf(application_id, custom_data)
             return BytesIO(pdf_data)
         except Exception as e:
-            current_app.logger.error(f"Ошибка создания BytesIO: {str(e)}")
+            current_app.logger.error("Ошибка создания BytesIO: %s", e)
             raise e
     
     def validate_template(self, template_path: str = None) -> bool:
@@ -211,7 +211,7 @@ class PDFService:
             return deleted_count
             
         except Exception as e:
-            current_app.logger.error(f"Ошибка очистки старых PDF: {str(e)}")
+            current_app.logger.error("Ошибка очистки старых PDF: %s", e)
             return 0
 
 
@@ -3,14 +3,23 @@
 """
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import joinedload, aliased
 from .base_service import BaseService
+from .organization_service import invalidate_reference_cache
+from models.base import utcnow
 from models.practice import AskForm, PracticeType, Status
 from models.academic import Student, Group
 from models.user import User
-from models.organization import Contract
+from models.organization import Contract, Organization
 from extensions import db
 
 
+# Время жизни сериализованной заявки в кэше (ключ версионируется по updated_at)
+APPLICATION_CACHE_TIMEOUT = 3600
+
+
 class PracticeService(BaseService):
     """Сервис для работы с практикой"""
     
@@ -89,20 +98,41 @@ class PracticeService(BaseService):
         """Получить заявки по статусу"""
         return AskForm.get_by_status(status_name)
     
+    def _transition_status(self, application_id: int, status_name: str, **values) -> bool:
+        """
+        Перевести заявку в новый статус одним UPDATE ... RETURNING.
+        Переход возможен только из нефинального статуса, поэтому
+        параллельные одобрение и отклонение не перезапишут друг друга.
+        """
+        target_status_id = select(Status.id).where(Status.name == status_name).scalar_subquery()
+        non_final_status_ids = select(Status.id).where(Status.is_final == False)
+        
+        stmt = (
+            update(AskForm)
+            .where(
+                AskForm.id == application_id,
+                AskForm.status_id.in_(non_final_status_ids),
+                target_status_id.isnot(None)
+            )
+            .values(status_id=target_status_id, updated_at=utcnow(), **values)
+            .returning(AskForm.id)
+        )
+        updated = db.session.execute(stmt).first() is not None
+        db.session.commit()
+        if updated:
+            # Одобренная заявка занимает слот договора — список доступных договоров устарел
+            invalidate_reference_cache('contracts')
+        return updated
+    
     def approve_application(self, application_id: int, approver_id: int) -> bool:
         """Одобрить заявку"""
         try:
-            application = self.get_by_id(application_id)
-            if not application:
-                return False
-            
             # Проверяем права на одобрение
             approver = User.get_by_id(approver_id)
             if not approver or not approver.is_teacher:
                 raise ValueError("Недостаточно прав для одобрения заявки")
             
-            application.approve()
-            return True
+            return self._transition_status(application_id, '2')
         except Exception as e:
             db.session.rollback()
             raise e
@@ -110,23 +140,19 @@ class PracticeService(BaseService):
     def reject_application(self, application_id: int, rejector_id: int, reason: str = None) -> bool:
         """Отклонить заявку"""
         try:
-            application = self.get_by_id(application_id)
-            if not application:
-                return False
-            
             # Проверяем права на отклонение
             rejector = User.get_by_id(rejector_id)
             if not rejector or not rejector.is_teacher:
                 raise ValueError("Недостаточно прав для отклонения заявки")
             
-            application.reject()
-            
-            # Добавляем причину отклонения в комментарии
+            values = {}
             if reason:
-                current_comments = application.comments or ""
-                application.update(comments=f"{current_comments}\nПричина отклонения: {reason}")
+                # Добавляем причину отклонения в комментарии
+                values['comments'] = (
+                    func.coalesce(AskForm.comments, '') + f"\nПричина отклонения: {reason}"
+                )
             
-            return True
+            return self._transition_status(application_id, '3', **values)
         except Exception as e:
             db.session.rollback()
             raise e
@@ -144,12 +170,116 @@ class PracticeService(BaseService):
             db.session.rollback()
             raise e
     
+    def _details_query(self):
+        """Запрос заявок с жадной загрузкой связей, нужных для сериализации"""
+        return AskForm.query.options(
+            joinedload(AskForm.student).joinedload(Student.group),
+            joinedload(AskForm.practice_type),
+            joinedload(AskForm.contract).joinedload(Contract.organization),
+            joinedload(AskForm.responsible_user),
+            joinedload(AskForm.consultant_user),
+            joinedload(AskForm.practice_leader_user),
+            joinedload(AskForm.status)
+        )
+    
     def get_application_with_details(self, application_id: int) -> Optional[Dict[str, Any]]:
         """Получить заявку с подробной информацией"""
-        application = self.get_by_id(application_id)
+        application = self._details_query().filter(AskForm.id == application_id).first()
         if not application:
             return None
         
+        return self._serialize_application(application)
+    
+    def list_applications_with_details(self, student_id: int = None, teacher_id: int = None,
+                                       status_name: str = None, group_id: int = None) -> List[Dict[str, Any]]:
+        """
+        Получить список заявок с подробной информацией.
+        Сначала выбираются только id и updated_at заявки и всех выводимых связей;
+        готовые словари берутся из кэша, а промахи догружаются одним запросом
+        с жадной загрузкой.
+        """
+        filters = dict(student_id=student_id, teacher_id=teacher_id,
+                       status_name=status_name, group_id=group_id)
+        cache = getattr(current_app, 'cache', None)
+        if cache is None:
+            query = self._filter_applications(self._details_query(), **filters)
+            return [self._serialize_application(application) for application in query.all()]
+        
+        versions = self._filter_applications(self._versions_query(), **filters).all()
+        app_ids = [row[0] for row in versions]
+        keys = [self._application_cache_key(row[0], self._latest_update(row[1:])) for row in versions]
+        cached = cache.get_many(*keys) if keys else []
+        
+        missing = {app_id: key for app_id, key, value in zip(app_ids, keys, cached) if value is None}
+        if missing:
+            loaded, to_cache = {}, {}
+            for application in self._details_query().filter(AskForm.id.in_(list(missing))).all():
+                data = self._serialize_application(application)
+                loaded[application.id] = data
+                to_cache[missing[application.id]] = data
+            cache.set_many(to_cache, timeout=APPLICATION_CACHE_TIMEOUT)
+            cached = [value if value is not None else loaded.get(app_id)
+                      for app_id, value in zip(app_ids, cached)]
+        
+        return [value for value in cached if value is not None]
+    
+    @staticmethod
+    def _versions_query():
+        """
+        id заявки и updated_at её самой и всех связей, попадающих в сериализацию:
+        правка студента, группы, договора, организации или пользователя тоже
+        меняет версию кэшированного словаря
+        """
+        responsible, consultant, leader = aliased(User), aliased(User), aliased(User)
+        return (
+            db.session.query(
+                AskForm.id, AskForm.updated_at,
+                Student.updated_at, Group.updated_at, PracticeType.updated_at,
+                Contract.updated_at, Organization.updated_at, Status.updated_at,
+                responsible.updated_at, consultant.updated_at, leader.updated_at
+            )
+            .select_from(AskForm)
+            .outerjoin(Student, AskForm.student_id == Student.id)
+            .outerjoin(Group, Student.group_id == Group.id)
+            .outerjoin(PracticeType, AskForm.practice_type_id == PracticeType.id)
+            .outerjoin(Contract, AskForm.contract_id == Contract.id)
+            .outerjoin(Organization, Contract.organization_id == Organization.id)
+            .outerjoin(Status, AskForm.status_id == Status.id)
+            .outerjoin(responsible, AskForm.responsible_user_id == responsible.id)
+            .outerjoin(consultant, AskForm.consultant_leader_id == consultant.id)
+            .outerjoin(leader, AskForm.practice_leader_id == leader.id)
+        )
+    
+    @staticmethod
+    def _latest_update(timestamps) -> Optional[datetime]:
+        """Самое позднее изменение среди заявки и её связей"""
+        return max((ts for ts in timestamps if ts is not None), default=None)
+    
+    @staticmethod
+    def _application_cache_key(application_id: int, updated_at: Optional[datetime]) -> str:
+        """Ключ кэша сериализованной заявки для конкретной версии"""
+        version = updated_at.timestamp() if updated_at else 0
+        return f"app:{application_id}:v{version}"
+    
+    @staticmethod
+    def _filter_applications(query, student_id: int = None, teacher_id: int = None,
+                             status_name: str = None, group_id: int = None):
+        """Применить фильтры списка заявок к запросу"""
+        if student_id is not None:
+            query = query.filter(AskForm.student_id == student_id)
+        if teacher_id is not None:
+            query = query.filter(
+                (AskForm.consultant_leader_id == teacher_id) |
+                (AskForm.practice_leader_id == teacher_id)
+            )
+        if status_name is not None:
+            query = query.filter(AskForm.status.has(Status.name == status_name))
+        if group_id is not None:
+            query = query.filter(AskForm.group_id == group_id)
+        return query
+    
+    def _serialize_application(self, application: AskForm) -> Dict[str, Any]:
+        """Преобразовать заявку в словарь с подробной информацией"""
         return {
             'id': application.id,
             'student': {
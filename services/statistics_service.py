@@ -0,0 +1,163 @@
+"""
+Сервис сводной статистики
+"""
+from typing import Dict, Any
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, and_, true
+from models.user import User, Role
+from models.academic import Student, Group, Direction
+from models.practice import AskForm, PracticeType, Status
+from models.organization import Organization, Contract
+from extensions import db
+
+
+class StatisticsService:
+    """Сервис сводной статистики для API"""
+    
+    def get_all_stats(self, expiring_days: int = 30) -> Dict[str, Any]:
+        """
+        Получить статистику пользователей, студентов, заявок и договоров.
+        Все счетчики считаются одним запросом с агрегатами FILTER,
+        разбивки по группам/направлениям/типам — по одному GROUP BY на каждую.
+        """
+        counters = self._get_counters(expiring_days)
+        
+        return {
+            'users': {
+                'total': counters.users_total,
+                'active': counters.users_active,
+                'teachers': counters.users_teachers,
+                'students': counters.users_students,
+                'consultants': counters.users_consultants,
+                'inactive': counters.users_total - counters.users_active
+            },
+            'students': {
+                'total_students': counters.students_total,
+                'groups': [
+                    {'group_name': name, 'students_count': count, 'direction': direction}
+                    for name, count, direction in db.session.execute(
+                        select(Group.name, func.count(Student.id), Direction.name)
+                        .select_from(Group)
+                        .outerjoin(Student, Student.group_id == Group.id)
+                        .outerjoin(Direction, Group.direction_id == Direction.id)
+                        .group_by(Group.id, Group.name, Direction.name)
+                        .order_by(Group.id)
+                    )
+                ],
+                'directions': [
+                    {'direction_name': name, 'students_count': count}
+                    for name, count in db.session.execute(
+                        select(Direction.name, func.count(Student.id))
+                        .select_from(Direction)
+                        .outerjoin(Group, Group.direction_id == Direction.id)
+                        .outerjoin(Student, Student.group_id == Group.id)
+                        .group_by(Direction.id, Direction.name)
+                        .order_by(Direction.id)
+                    )
+                ]
+            },
+            'applications': {
+                'total': counters.applications_total,
+                'pending': counters.applications_pending,
+                'approved': counters.applications_approved,
+                'rejected': counters.applications_rejected,
+                'in_progress': counters.applications_in_progress,
+                'practice_types': [
+                    {'name': name, 'count': count}
+                    for name, count in db.session.execute(
+                        select(PracticeType.name, func.count(AskForm.id))
+                        .select_from(PracticeType)
+                        .outerjoin(AskForm, AskForm.practice_type_id == PracticeType.id)
+                        .group_by(PracticeType.id, PracticeType.name)
+                        .order_by(PracticeType.id)
+                    )
+                ],
+                'groups': [
+                    {'name': name, 'count': count}
+                    for name, count in db.session.execute(
+                        select(Group.name, func.count(AskForm.id))
+                        .select_from(Group)
+                        .outerjoin(AskForm, AskForm.group_id == Group.id)
+                        .group_by(Group.id, Group.name)
+                        .order_by(Group.id)
+                    )
+                ]
+            },
+            'contracts': {
+                'total': counters.contracts_total,
+                'active': counters.contracts_active,
+                'current': counters.contracts_current,
+                'expiring_soon': counters.contracts_expiring,
+                'organizations': [
+                    {'organization_name': name, 'contracts_count': count, 'active_contracts': active}
+                    for name, count, active in db.session.execute(
+                        select(
+                            Organization.name,
+                            func.count(Contract.id),
+                            func.count(Contract.id).filter(Contract.is_active == True)
+                        )
+                        .select_from(Organization)
+                        .outerjoin(Contract, Contract.organization_id == Organization.id)
+                        .group_by(Organization.id, Organization.name)
+                        .order_by(Organization.id)
+                    )
+                ]
+            }
+        }
+    
+    def _get_counters(self, expiring_days: int):
+        """Все скалярные счетчики статистики одной строкой"""
+        now = datetime.utcnow()
+        expiring_until = now + timedelta(days=expiring_days)
+        
+        users = (
+            select(
+                func.count(User.id).label('users_total'),
+                func.count(User.id).filter(User.is_active == True).label('users_active'),
+                func.count(User.id).filter(Role.name == 'преподаватель').label('users_teachers'),
+                func.count(User.id).filter(Role.name == 'студент').label('users_students'),
+                func.count(User.id).filter(Role.name == 'преподаватель консультант').label('users_consultants')
+            )
+            .select_from(User)
+            .outerjoin(Role, User.role_id == Role.id)
+            .subquery()
+        )
+        students = select(func.count(Student.id).label('students_total')).subquery()
+        applications = (
+            select(
+                func.count(AskForm.id).label('applications_total'),
+                func.count(AskForm.id).filter(Status.name == '0').label('applications_pending'),
+                func.count(AskForm.id).filter(Status.name == '2').label('applications_approved'),
+                func.count(AskForm.id).filter(Status.name == '3').label('applications_rejected'),
+                func.count(AskForm.id).filter(Status.name == '1').label('applications_in_progress')
+            )
+            .select_from(AskForm)
+            .outerjoin(Status, AskForm.status_id == Status.id)
+            .subquery()
+        )
+        contracts = (
+            select(
+                func.count(Contract.id).label('contracts_total'),
+                func.count(Contract.id).filter(Contract.is_active == True).label('contracts_active'),
+                func.count(Contract.id).filter(and_(
+                    Contract.is_active == True,
+                    Contract.date_start <= now,
+                    Contract.date_end >= now
+                )).label('contracts_current'),
+                func.count(Contract.id).filter(and_(
+                    Contract.is_active == True,
+                    Contract.date_end <= expiring_until,
+                    Contract.date_end >= now
+                )).label('contracts_expiring')
+            )
+            .subquery()
+        )
+        
+        # Каждый подзапрос возвращает ровно одну строку, их соединение — тоже одну
+        return db.session.execute(
+            select(users, students, applications, contracts).select_from(
+                users.join(students, true())
+                .join(applications, true())
+                .join(contracts, true())
+            )
+        ).one()
@@ -2,6 +2,7 @@
 Сервис для работы с пользователями
 """
 from typing import Optional, List
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash, check_password_hash
 from .base_service import BaseService
 from models.user import User, Role
@@ -14,6 +15,16 @@ class UserService(BaseService):
     def __init__(self):
         super().__init__(User)
     
+    def _list_statement(self, role: str = None, **filters):
+        """Выборка пользователей с названием роли, без хэша пароля"""
+        table = User.__table__
+        columns = [column for column in table.c if column.name != 'password_hash']
+        stmt = select(*columns, Role.name.label('role')).outerjoin(Role, User.role_id == Role.id)
+        conditions = self._filter_conditions(table, filters)
+        if role:
+            conditions.append(Role.name == role)
+        return stmt, conditions
+    
     def create_user(self, username: str, password: str, email: str = None, 
                    role_name: str = 'студент') -> Optional[User]:
         """Создать нового пользователя"""
@@ -1,8 +1,83 @@
 from docx import Document
+from io import BytesIO
+from functools import lru_cache
 import re
 import os
 import subprocess
 
+# Последовательности подчёркиваний (поля для заполнения в шаблоне)
+UNDERLINE_RE = re.compile(r'_+')
+
+# Постоянно запущенный LibreOffice (unoserver): конвертация без холодного старта soffice
+OFFICE_SERVER_HOST = os.environ.get('OFFICE_SERVER_HOST', '127.0.0.1')
+OFFICE_SERVER_PORT = os.environ.get('OFFICE_SERVER_PORT', '2003')
+_office_server = None
+
+def start_office_server():
+    """
+    Starts a long-lived unoserver (headless LibreOffice) process once per process
+    Returns the process, or None if unoserver is not installed
+    If another worker already listens on the port, the new process simply exits
+    and conversions go to the running server
+    """
+    global _office_server
+    if _office_server is not None and _office_server.poll() is None:
+        return _office_server
+    
+    import shutil
+    executable = shutil.which('unoserver')
+    if not executable:
+        return None
+    
+    _office_server = subprocess.Popen(
+        [executable, '--interface', OFFICE_SERVER_HOST, '--port', OFFICE_SERVER_PORT],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    return _office_server
+
+def convert_with_office_server(docx_path):
+    """
+    Converts a DOCX file to PDF through a running unoserver
+    Returns the PDF content as bytes, or None if the server is unavailable
+    """
+    try:
+        from unoserver.client import UnoClient
+    except ImportError:
+        return None
+    
+    try:
+        client = UnoClient(server=OFFICE_SERVER_HOST, port=OFFICE_SERVER_PORT)
+        return client.convert(inpath=os.path.abspath(docx_path), convert_to='pdf')
+    except Exception:
+        return None
+
+# Кэш содержимого DOCX-шаблонов: путь -> (mtime, байты).
+# Шаблон читается с диска один раз и перечитывается только при изменении файла.
+_TEMPLATE_BYTES_CACHE = {}
+
+def load_template_bytes(template_path):
+    """
+    Returns the raw bytes of a DOCX template, cached per process
+    """
+    mtime = os.path.getmtime(template_path)
+    cached = _TEMPLATE_BYTES_CACHE.get(template_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    with open(template_path, 'rb') as f:
+        content = f.read()
+    _TEMPLATE_BYTES_CACHE[template_path] = (mtime, content)
+    return content
+
+def open_template(template):
+    """
+    Opens a DOCX template given either its path or its raw bytes
+    """
+    if isinstance(template, (bytes, bytearray)):
+        return Document(BytesIO(template))
+    return Document(BytesIO(load_template_bytes(template)))
+
 def replace_text(paragraph, key, value):
     """
     Replaces text within a paragraph's runs
@@ -14,6 +89,34 @@ def replace_text(paragraph, key, value):
                 text = inline[i].text.replace(key, value)
                 inline[i].text = text
 
+@lru_cache(maxsize=16)
+def compile_substitution(keys):
+    """
+    Returns a function subst(text, data) specialized for the given placeholder keys
+    The body is generated once per set of keys as a chain of literal str.replace calls
+    ([KEY] first, then bare KEY; longer keys first), without loops or regex callbacks
+    Values are passed through str(), so None/int values in data never raise
+    """
+    chain = ''.join(
+        f'.replace({f"[{key}]"!r}, str(data[{key!r}])).replace({key!r}, str(data[{key!r}]))'
+        for key in sorted(keys, key=len, reverse=True)
+    )
+    namespace = {}
+    exec(f'def subst(text, data):\n    return text{chain}\n', namespace)
+    return namespace['subst']
+
+def replace_placeholders(paragraph, subst, data):
+    """
+    Replaces all placeholders within a paragraph's runs using a compiled subst function
+    """
+    text = paragraph.text
+    if subst(text, data) == text:
+        return
+    for run in paragraph.runs:
+        new_text = subst(run.text, data)
+        if new_text != run.text:
+            run.text = new_text
+
 def replace_underline(paragraph, key, value):
     """
     Replaces underline characters with the specified value
@@ -21,42 +124,38 @@ def replace_underline(paragraph, key, value):
     text = paragraph.text
     if '_____' in text or '___' in text:
         # Заменяем последовательности подчеркиваний
-        new_text = re.sub(r'_+', lambda x: value if x.group() in ['_____', '___'] else x.group(), text)
+        new_text = UNDERLINE_RE.sub(lambda x: value if x.group() in ['_____', '___'] else x.group(), text)
         if new_text != text:
             paragraph.text = new_text
 
 def fill_docx_template(template_path, data, output_path=None):
     """
     Fills a DOCX template with data and returns the Document object
+    template_path may be a path or the template bytes
     If output_path is provided, saves the document to that path
     """
     # Open the document template
-    doc = Document(template_path)
-    
-    # Process paragraphs in the document
-    for paragraph in doc.paragraphs:
-        # Replace markers in square brackets
-        for key, value in data.items():
-            if f'[{key}]' in paragraph.text:
-                replace_text(paragraph, f'[{key}]', value)
-            elif key in paragraph.text:
-                replace_text(paragraph, key, value)
-        
-        # Replace underlines
-        for key, value in data.items():
-            replace_underline(paragraph, key, value)
+    doc = open_template(template_path)
+    if not data:
+        paragraphs = []
+    else:
+        paragraphs = list(doc.paragraphs)
+        # Process tables if present
+        for table in doc.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    paragraphs.extend(cell.paragraphs)
     
-    # Process tables if present
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for key, value in data.items():
-                        if f'[{key}]' in paragraph.text:
-                            replace_text(paragraph, f'[{key}]', value)
-                        elif key in paragraph.text:
-                            replace_text(paragraph, key, value)
-                        replace_underline(paragraph, key, value)
+    if paragraphs:
+        subst = compile_substitution(tuple(data))
+        # Underlines are filled with the first value (later values never matched,
+        # since the first replacement consumes every ___/_____ sequence)
+        first_key, first_value = next(iter(data.items()))
+        for paragraph in paragraphs:
+            # Replace markers ([KEY] or KEY) in a single pass
+            replace_placeholders(paragraph, subst, data)
+            # Replace underlines
+            replace_underline(paragraph, first_key, str(first_value))
     
     # Save the document if output_path is provided
     if output_path:
@@ -65,10 +164,11 @@ def fill_docx_template(template_path, data, output_path=None):
     
     return doc
 
-def convert_to_pdf(docx_path_or_buffer, pdf_output_path=None):
+def convert_to_pdf(docx_path_or_buffer, pdf_output_path=None, office_profile_dir=None):
     """
     Converts a DOCX file to PDF using available methods
     Returns the path to the PDF or the PDF content as bytes
+    office_profile_dir gives soffice its own user profile, so several conversions can run in parallel
     """
     # If input is a buffer, save to temp file first
     is_buffer = not isinstance(docx_path_or_buffer, str)
@@ -82,13 +182,26 @@ def convert_to_pdf(docx_path_or_buffer, pdf_output_path=None):
             import tempfile
             # Save buffer to temporary file
             temp_docx = tempfile.NamedTemporaryFile(suffix='.docx', delete=False)
-            docx_path_or_buffer.seek(0)
-            temp_docx.write(docx_path_or_buffer.read())
+            if hasattr(docx_path_or_buffer, 'getbuffer'):
+                # BytesIO: write its buffer directly without an intermediate copy
+                temp_docx.write(docx_path_or_buffer.getbuffer())
+            else:
+                docx_path_or_buffer.seek(0)
+                temp_docx.write(docx_path_or_buffer.read())
             temp_docx.close()
             docx_path = temp_docx.name
         else:
             docx_path = docx_path_or_buffer
         
+        # Method 0: Use an already running LibreOffice server (no process start per call)
+        pdf_content = convert_with_office_server(docx_path)
+        if pdf_content is not None:
+            if pdf_output_path:
+                with open(pdf_output_path, 'wb') as f:
+                    f.write(pdf_content)
+                return pdf_output_path
+            return pdf_content
+        
         # Method 1: Use docx2pdf library
         try:
             from docx2pdf import convert
@@ -154,9 +267,12 @@ def convert_to_pdf(docx_path_or_buffer, pdf_output_path=None):
                         break
             
             temp_dir = tempfile.mkdtemp()
-            subprocess.run([
-                libre_office,
-                '--headless',
+            command = [libre_office, '--headless']
+            if office_profile_dir:
+                # Without a separate profile a second soffice hands the job over to the running one
+                from pathlib import Path
+                command.append('-env:UserInstallation=' + Path(office_profile_dir).resolve().as_uri())
+            subprocess.run(command + [
                 '--convert-to', 'pdf',
                 '--outdir', temp_dir,
                 docx_path
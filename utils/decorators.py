@@ -0,0 +1,112 @@
+"""
+Декораторы для маршрутов приложения
+"""
+from functools import wraps
+from flask import abort, current_app, jsonify, Response
+from flask_login import login_required, current_user
+from extensions import db
+from models.user import ROLE_MASKS
+from .exceptions import ValidationError, BusinessLogicError, NotFoundError
+
+# Ошибки, которые обрабатываются обработчиками приложения (app_factory.register_error_handlers)
+HANDLED_ERRORS = (ValidationError, BusinessLogicError, NotFoundError)
+
+
+def _roles_to_mask(roles) -> int:
+    """Свести список названий ролей к битовой маске"""
+    mask = 0
+    for role_name in roles:
+        mask |= ROLE_MASKS.get(role_name, 0)
+    return mask
+
+
+def _to_json_response(result):
+    """Преобразовать результат view (dict или (dict, status)) в JSON-ответ"""
+    if isinstance(result, Response):
+        return result
+    if isinstance(result, tuple):
+        body, *rest = result
+        return (jsonify(body), *rest)
+    return jsonify(result)
+
+
+def _handle_unexpected_error(error):
+    """Откатить сессию и записать непредвиденную ошибку в лог"""
+    db.session.rollback()
+    current_app.logger.exception("Unhandled error in view: %s", error)
+    abort(500)
+
+
+def rate_limit(*args, **kwargs):
+    """Ограничение частоты запросов (см. ddos_protection.rate_limit)"""
+    # Импорт по требованию: модуль защиты при загрузке подключается к Redis
+    from ddos_protection import rate_limit as ddos_rate_limit
+    return ddos_rate_limit(*args, **kwargs)
+
+
+def role_required(*roles):
+    """Доступ только для пользователей с одной из указанных ролей"""
+    required_mask = _roles_to_mask(roles)
+    
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated:
+                abort(401)
+            if not current_user.has_any_role(required_mask):
+                abort(403)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def json_response(f):
+    """Сериализовать результат view в JSON"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        return _to_json_response(f(*args, **kwargs))
+    return wrapper
+
+
+def handle_errors(f):
+    """Пропустить известные ошибки к обработчикам приложения, остальные превратить в 500"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        try:
+            return f(*args, **kwargs)
+        except HANDLED_ERRORS:
+            raise
+        except Exception as e:
+            _handle_unexpected_error(e)
+    return wrapper
+
+
+def api_endpoint(*roles):
+    """
+    Объединенный декоратор API: аутентификация, проверка ролей,
+    обработка ошибок и JSON-ответ в одной обертке вместо четырех.
+    """
+    required_mask = _roles_to_mask(roles)
+    
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not current_user.is_authenticated:
+                abort(401)
+            if required_mask and not current_user.role_mask & required_mask:
+                abort(403)
+            try:
+                result = f(*args, **kwargs)
+            except HANDLED_ERRORS:
+                raise
+            except Exception as e:
+                _handle_unexpected_error(e)
+            return _to_json_response(result)
+        return wrapper
+    return decorator
+
+
+__all__ = [
+    'login_required', 'role_required', 'json_response', 'handle_errors',
+    'rate_limit', 'api_endpoint'
+]
@@ -0,0 +1,44 @@
+"""
+JSON-провайдер Flask на основе orjson
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON-провайдер, сериализующий ответы через orjson сразу в байты"""
+    
+    def _options(self, indent: bool = False) -> int:
+        # Даты отдаем в default, чтобы формат совпадал со стандартным провайдером
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs) -> str:
+        """Сериализовать объект в строку JSON"""
+        indent = kwargs.pop('indent', None)
+        kwargs.pop('separators', None)
+        if kwargs:
+            # Нестандартные аргументы json.dumps orjson не поддерживает
+            return super().dumps(obj, indent=indent, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options(bool(indent))).decode()
+    
+    def response(self, *args, **kwargs):
+        """Сформировать JSON-ответ без промежуточной строки"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    """Подключить orjson-провайдер, если библиотека установлена"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -7,6 +7,17 @@ from datetime import datetime
 from werkzeug.security import generate_password_hash
 
 
+# Регулярные выражения компилируются один раз при импорте модуля
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+NON_DIGIT_RE = re.compile(r'\D')
+UPPERCASE_RE = re.compile(r'[A-Z]')
+LOWERCASE_RE = re.compile(r'[a-z]')
+DIGIT_RE = re.compile(r'\d')
+SPECIAL_CHAR_RE = re.compile(r'[!@#$%^&*(),.?":{}|<>]')
+USERNAME_RE = re.compile(r'^[a-zA-Z0-9_.-]+$')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+
 class Validator:
     """Класс для валидации данных"""
     
@@ -16,8 +27,7 @@ class Validator:
         if not email:
             return False
         
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return bool(EMAIL_RE.match(email))
     
     @staticmethod
     def validate_phone(phone: str) -> bool:
@@ -26,7 +36,7 @@ class Validator:
             return False
         
         # Убираем все нецифровые символы
-        digits = re.sub(r'\D', '', phone)
+        digits = NON_DIGIT_RE.sub('', phone)
         
         # Проверяем длину (должно быть 10-11 цифр)
         return 10 <= len(digits) <= 11
@@ -49,16 +59,16 @@ class Validator:
             result['valid'] = False
             result['errors'].append('Пароль должен содержать минимум 8 символов')
         
-        if not re.search(r'[A-Z]', password):
+        if not UPPERCASE_RE.search(password):
             result['errors'].append('Пароль должен содержать заглавные буквы')
         
-        if not re.search(r'[a-z]', password):
+        if not LOWERCASE_RE.search(password):
             result['errors'].append('Пароль должен содержать строчные буквы')
         
-        if not re.search(r'\d', password):
+        if not DIGIT_RE.search(password):
             result['errors'].append('Пароль должен содержать цифры')
         
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        if not SPECIAL_CHAR_RE.search(password):
             result['errors'].append('Пароль должен содержать специальные символы')
         
         # Определяем силу пароля
@@ -95,7 +105,7 @@ class Validator:
             result['valid'] = False
             result['errors'].append('Имя пользователя не должно превышать 50 символов')
         
-        if not re.match(r'^[a-zA-Z0-9_.-]+$', username):
+        if not USERNAME_RE.match(username):
             result['valid'] = False
             result['errors'].append('Имя пользователя может содержать только буквы, цифры, точки, дефисы и подчеркивания')
         
@@ -195,7 +205,7 @@ class Validator:
             return ''
         
         # Убираем HTML теги
-        value = re.sub(r'<[^>]+>', '', value)
+        value = HTML_TAG_RE.sub('', value)
         
         # Убираем лишние пробелы
         value = ' '.join(value.split())